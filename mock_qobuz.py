@@ -0,0 +1,554 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Local mock Qobuz server, scale test and benchmarks for web-scraper_16.py.
+
+Kept out of the scraper so it only loads what a scrape needs; this script
+imports the scraper from the same folder.
+
+MOCK SERVER
+-----------
+Synthetic labels and albums with Qobuz-like listing/album pages, configurable
+latency and 429/5xx injection:
+    /us-en/label/mock-label-<L>/download-streaming-albums/<L>[/page/<n>]
+    /us-en/album/synthetic-album-<L>-<i>/m<L>x<i>
+
+SCALE TEST
+----------
+Runs the full scrape (web-scraper_16.main) against the mock server once per
+label count, each in its own child process: the timed run is not traced, and
+peak memory is the child's peak RSS (ru_maxrss; not available on Windows).
+
+USAGE
+-----
+    python mock_qobuz.py serve --port 8780     # synthetic Qobuz (latency, 429/5xx injection)
+    python mock_qobuz.py scale-test --labels 50,500,5000 --rate-429 0.01  # full pipeline vs mock server
+    python mock_qobuz.py bench-dates  # release-date extraction throughput (synthetic listings)
+    python mock_qobuz.py check-dates  # release-date extraction vs the original regexes (exit 1 on mismatch)
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import random
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup
+from rich.table import Table
+
+try:  # peak RSS of the scale-test child (Unix only)
+    import resource
+except ImportError:
+    resource = None
+
+
+def _load_scraper():
+    """web-scraper_16.py from this folder (its file name is not importable with "import")."""
+    path = Path(__file__).resolve().with_name("web-scraper_16.py")
+    spec = importlib.util.spec_from_file_location("web_scraper_16", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module  # dataclasses look their module up while the class is built
+    spec.loader.exec_module(module)
+    return module
+
+
+ws = _load_scraper()
+console = ws.console
+
+RE_MOCK_LISTING = re.compile(r"/us-en/label/mock-label-\d+/download-streaming-albums/(\d+)(?:/page/(\d+))?/?")
+RE_MOCK_ALBUM = re.compile(r"/us-en/album/synthetic-album-[\w-]+/m(\d+)x(\d+)")
+SCALE_RESULT_PREFIX = "SCALE "  # the scale-run child's result line on stdout
+
+
+def build_synthetic_listing_html(n_tiles: int, seed: int = 0) -> str:
+    """Listing page with Qobuz-like album tiles (used by benchmarks)."""
+    rnd = random.Random(seed)
+    tiles = []
+    for i in range(n_tiles):
+        d = date(2020, 1, 1).toordinal() + rnd.randrange(0, 2500)
+        d = date.fromordinal(d)
+        if rnd.random() < 0.8:
+            phrase = f"Released by Label {i % 7} on {d.strftime('%b')} {d.day}, {d.year}"
+        else:
+            phrase = f"To be released on {d.month}/{d.day}/{d.strftime('%y')}"
+        tiles.append(
+            '<div class="product__item"><div class="product__container">'
+            f'<a href="/us-en/album/album-{i}/id{i:08d}"><img alt="cover"/></a>'
+            f'<a href="/us-en/album/album-{i}/id{i:08d}">Album {i}</a>'
+            f'<p><a href="/us-en/interpreter/artist-{i}/{i}">Artist {i}</a></p>'
+            f"<p>{phrase}</p>"
+            "</div></div>"
+        )
+    return "<html><body><div class=\"product__list\">" + "".join(tiles) + "</div></body></html>"
+
+
+def bench_release_dates(tiles: int, pages: int) -> None:
+    """Throughput of release-date extraction on a synthetic listing-page workload."""
+    page_url = "https://www.qobuz.com/us-en/label/bench/download-streaming-albums/1"
+    html = build_synthetic_listing_html(tiles)
+    start, end = date(1900, 1, 1), date(2100, 1, 1)
+
+    # Isolated: the texts extract_listing_release_date_for_link sees on each hop.
+    soup = BeautifulSoup(html, "html.parser")
+    texts = []
+    for a in soup.find_all("a", href=True):
+        node = a
+        for _ in range(4):
+            texts.append(node.get_text(" ", strip=True))
+            node = node.parent
+
+    t0 = time.perf_counter()
+    for _ in range(pages):
+        for t in texts:
+            ws.extract_release_date_from_text(t)
+    dt_text = time.perf_counter() - t0
+
+    # End to end: full listing parse incl. DOM walk.
+    t0 = time.perf_counter()
+    found = 0
+    for _ in range(pages):
+        found = len(ws.extract_album_candidates_from_listing(html, page_url, "bench", start, end))
+    dt_page = time.perf_counter() - t0
+
+    calls = len(texts) * pages
+    console.print("[bold]Benchmark: release-date extraction[/bold]")
+    console.print(f"• extract_release_date_from_text: [bold]{calls / dt_text:,.0f}[/bold] calls/s ({calls} calls)")
+    console.print(
+        f"• extract_album_candidates_from_listing: [bold]{pages / dt_page:,.1f}[/bold] pages/s, "
+        f"[bold]{pages * tiles / dt_page:,.0f}[/bold] tiles/s ({found}/{tiles} tiles dated)"
+    )
+    console.print(f"• date cache: {ws._parse_month_date_norm.cache_info()}")
+
+
+# Texts where phrase priority matters, with the date the original six-regex extraction returned.
+RELEASE_DATE_CASES = [
+    ("To be released on Sept 3, 2025 … Released on May 1, 2020", date(2025, 9, 3)),
+    ("Released on May 1, 2020 … To be released on Sept 3, 2025", date(2020, 5, 1)),
+    ("To be released on 9/3/25 Released on 5/1/20", date(2025, 9, 3)),
+    ("Released on 5/1/20 To be released on Sept 3, 2025", date(2025, 9, 3)),
+    ("Released on Jan 2, 2021 Released by Label on 3/4/22", date(2021, 1, 2)),
+    ("Released by Label on 3/4/22 Released by Other on Jan 2, 2021", date(2021, 1, 2)),
+    ("Released by Label on 3/4/22, shipped on Jan 2, 2021", date(2021, 1, 2)),
+    ("Released by Label on 3/4/22 To be released on 5/6/23", date(2022, 3, 4)),
+    ("released   by Label\non\tFeb 29, 2024", date(2024, 2, 29)),
+    ("Unreleased on Jan 2, 2021", None),
+    ("To be released on Feb 30, 2024 Released on 1/2/21", None),
+]
+
+
+def _release_date_reference(text: str) -> Optional[date]:
+    """The original extraction (six regexes tried in order on whitespace-normalized text)."""
+    if not text:
+        return None
+    t = " ".join(text.split())
+    month, num = r"([A-Za-z\.]+ \d{1,2}, \d{4})", r"(\d{1,2}/\d{1,2}/\d{2,4})"
+    for prefix in (r"\bReleased by .*? on ", r"\bReleased on ", r"\bTo be released on "):
+        m = re.search(prefix + month, t, re.IGNORECASE)
+        if m:
+            return ws.parse_english_month_date(m.group(1))
+    for prefix in (r"\bReleased by .*? on ", r"\bReleased on ", r"\bTo be released on "):
+        m = re.search(prefix + num, t, re.IGNORECASE)
+        if m:
+            return ws.parse_numeric_us_date(m.group(1))
+    return None
+
+
+def build_release_date_text(rnd: random.Random) -> str:
+    """Random text mixing release-date phrases, date formats, case and whitespace."""
+    parts = []
+    for _ in range(rnd.randrange(1, 5)):
+        d = date(2018, 1, 1) + timedelta(days=rnd.randrange(0, 3000))
+        when = rnd.choice(
+            [
+                f"{d.strftime('%b')} {d.day}, {d.year}",
+                f"{d.strftime('%B')} {d.day}, {d.year}",
+                f"Sept. {d.day}, {d.year}",
+                f"{d.month}/{d.day}/{d.strftime('%y')}",
+                f"{d.month}/{d.day}/{d.year}",
+                f"{d.month}/{d.day}",
+            ]
+        )
+        phrase = rnd.choice(
+            ["Released by Label on", "Released on", "To be released on", "released by X and Y on", "Unreleased on", "out on"]
+        )
+        if rnd.random() < 0.2:
+            phrase = phrase.upper()
+        sep = rnd.choice([" ", "  ", "\n", " \t"])
+        parts.append(phrase.replace(" ", sep) + sep + when)
+        parts.append(rnd.choice(["", "…", "Label: Foo", "Genre: Classical", "by the orchestra on tour"]))
+    return " ".join(parts)
+
+
+def check_release_dates(samples: int, seed: int = 0) -> int:
+    """Differential check of extract_release_date_from_text against the original extraction:
+    RELEASE_DATE_CASES plus `samples` random texts. Returns the number of mismatches."""
+    rnd = random.Random(seed)
+    cases = list(RELEASE_DATE_CASES)
+    cases += [(t, _release_date_reference(t)) for t in (build_release_date_text(rnd) for _ in range(samples))]
+    mismatches = 0
+    for text, want in cases:
+        got = ws.extract_release_date_from_text(text)
+        if got != want:
+            mismatches += 1
+            if mismatches <= 10:
+                console.print(f"[bold red]✖[/bold red] {text!r}: {got} (oczekiwano {want})")
+    console.print(
+        f"[bold]Daty wydania vs oryginalna ekstrakcja:[/bold] {len(cases)} tekstów, "
+        f"[bold]{'OK' if not mismatches else f'{mismatches} różnic'}[/bold]"
+    )
+    return mismatches
+
+
+@dataclass(frozen=True)
+class MockConfig:
+    """Synthetic catalogue and fault injection for the local mock Qobuz server."""
+
+    albums_per_label: int = 40
+    page_size: int = 24  # album tiles per listing page
+    album_padding_kb: int = 40  # filler text per album page (real pages are ~100-300 KiB)
+    structured_ratio: float = 0.5  # share of album pages with JSON-LD
+    latency_ms: float = 20.0
+    jitter_ms: float = 10.0
+    rate_429: float = 0.0
+    rate_5xx: float = 0.0
+    seed: int = 0
+
+
+def mock_album(cfg: MockConfig, label_id: int, idx: int) -> dict:
+    """Deterministic synthetic album `idx` of label `label_id`."""
+    rnd = random.Random(f"{cfg.seed}:{label_id}:{idx}")
+    released = date(2020, 1, 1) + timedelta(days=rnd.randrange(0, 3650))
+    genre = rnd.choices(
+        ["Classical / Chamber Music", "Classical / Opera", "Jazz / Contemporary Jazz", "Pop/Rock"],
+        weights=[50, 30, 12, 8],
+    )[0]
+    return {
+        "title": f"Synthetic Album {label_id}-{idx}",
+        "artist": f"Ensemble {rnd.randrange(1, 500)}",
+        "label": f"Mock Label {label_id}",
+        "released": released,
+        "seconds": rnd.randrange(5 * 60, 140 * 60),
+        "genre": genre,
+        "path": f"/us-en/album/synthetic-album-{label_id}-{idx}/m{label_id}x{idx}",
+        "structured": rnd.random() < cfg.structured_ratio,
+    }
+
+
+def mock_label_url(base_url: str, label_id: int) -> str:
+    return f"{base_url}/us-en/label/mock-label-{label_id}/download-streaming-albums/{label_id}"
+
+
+def mock_listing_html(cfg: MockConfig, label_id: int, page: int) -> Optional[str]:
+    first = (page - 1) * cfg.page_size
+    if page < 1 or first >= cfg.albums_per_label:
+        return None
+    tiles = []
+    for idx in range(first, min(first + cfg.page_size, cfg.albums_per_label)):
+        a = mock_album(cfg, label_id, idx)
+        d = a["released"]
+        tiles.append(
+            '<div class="product__item"><div class="product__container">'
+            f'<a href="{a["path"]}"><img alt="cover"/></a>'
+            f'<a href="{a["path"]}">{a["title"]}</a>'
+            f'<p><a href="/us-en/interpreter/x/{idx}">{a["artist"]}</a></p>'
+            f'<p>Released by {a["label"]} on {d.strftime("%b")} {d.day}, {d.year}</p>'
+            "</div></div>"
+        )
+    pages = []
+    for n in range(1, (cfg.albums_per_label - 1) // cfg.page_size + 2):
+        pages.append(f'<a href="/us-en/label/mock-label-{label_id}/download-streaming-albums/{label_id}/page/{n}">{n}</a>')
+    return (
+        f"<html><head><meta charset=\"utf-8\"><title>Mock Label {label_id}</title></head><body>"
+        f'<div class="product__list">{"".join(tiles)}</div><nav class="pagination">{"".join(pages)}</nav>'
+        "</body></html>"
+    )
+
+
+def mock_album_html(cfg: MockConfig, label_id: int, idx: int) -> Optional[str]:
+    if not (0 <= idx < cfg.albums_per_label):
+        return None
+    a = mock_album(cfg, label_id, idx)
+    d, secs = a["released"], a["seconds"]
+    ld = ""
+    if a["structured"]:
+        ld = '<script type="application/ld+json">' + json.dumps(
+            {
+                "@context": "https://schema.org",
+                "@type": "MusicAlbum",
+                "name": a["title"],
+                "byArtist": [{"@type": "MusicGroup", "name": a["artist"]}],
+                "datePublished": d.isoformat(),
+                "genre": [a["genre"]],
+                "duration": f"PT{secs // 3600}H{secs % 3600 // 60}M{secs % 60}S",
+            }
+        ) + "</script>"
+    filler = ("<p>" + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 16 + "</p>") * max(
+        0, cfg.album_padding_kb
+    )
+    return (
+        f"<html><head><meta charset=\"utf-8\"><title>{a['title']}</title>{ld}</head><body>"
+        f"<h1>{a['title']} by {a['artist']}</h1>"
+        f"<ul><li>Released on {d.month}/{d.day}/{d.strftime('%y')} by {a['label']}</li>"
+        f"<li>Main artists: <a href=\"/us-en/interpreter/x/{idx}\">{a['artist']}</a></li></ul>"
+        f"<p>Total length: {ws._seconds_to_hms(secs)}</p>"
+        f"<section><h2>About the album</h2><ul><li>Genre: {a['genre']}</li><li>Label: {a['label']}</li></ul></section>"
+        f"<div class=\"review\">{filler}</div></body></html>"
+    )
+
+
+class MockQobuzHandler(BaseHTTPRequestHandler):
+    """Serves mock_listing_html / mock_album_html with configured latency and 429/5xx injection."""
+
+    server_version = "MockQobuz/1.0"
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+    def do_GET(self) -> None:
+        cfg: MockConfig = self.server.config
+        rnd = self.server.rnd
+        time.sleep(max(0.0, cfg.latency_ms + rnd.uniform(-cfg.jitter_ms, cfg.jitter_ms)) / 1000)
+
+        roll = rnd.random()
+        if roll < cfg.rate_429:
+            return self._send(429, "Too Many Requests", {"Retry-After": "1"})
+        if roll < cfg.rate_429 + cfg.rate_5xx:
+            return self._send(503, "Service Unavailable")
+
+        path = urlparse(self.path).path
+        body = None
+        m = RE_MOCK_LISTING.fullmatch(path)
+        if m:
+            body = mock_listing_html(cfg, int(m.group(1)), int(m.group(2) or 1))
+        else:
+            m = RE_MOCK_ALBUM.fullmatch(path)
+            if m:
+                body = mock_album_html(cfg, int(m.group(1)), int(m.group(2)))
+        if body is None:
+            return self._send(404, "Not Found")
+        self._send(200, body)
+
+    def _send(self, status: int, body: str, headers: Optional[Dict[str, str]] = None) -> None:
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+class MockQobuzServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address) -> None:
+        # the scraper drops keep-alive connections when it stops; not worth a traceback
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def serve_mock(host: str, port: int, cfg: MockConfig) -> None:
+    """Run the mock Qobuz server until interrupted; prints "MOCK <port>" once listening."""
+    server = MockQobuzServer((host, port), MockQobuzHandler)
+    server.config = cfg
+    server.rnd = random.Random(cfg.seed)
+    print(f"MOCK {server.server_port}", flush=True)
+    signal.signal(signal.SIGTERM, ws._raise_keyboard_interrupt)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024  # bytes on macOS, KiB elsewhere
+
+
+def scale_run(base_url: str, labels: int, min_minutes: int, backoff_scale: float) -> None:
+    """One scale-test measurement (child process): main() on `labels` mock labels, untraced.
+
+    Prints a single SCALE_RESULT_PREFIX line with the run summary as JSON.
+    """
+    settings = ws.RunSettings(date(2000, 1, 1), date(2100, 12, 31), min_minutes, 0.0, 0.0, backoff_scale)
+    with tempfile.TemporaryDirectory(prefix="qobuz-scale-") as tmp:
+        work_dir = Path(tmp)
+        (work_dir / ws.LABELS_FILE).write_text(
+            "".join(f"Mock Label {i} - {mock_label_url(base_url, i)}\n" for i in range(1, labels + 1)),
+            encoding="utf-8",
+        )
+        console.quiet = True
+        t0 = time.perf_counter()
+        summary = ws.main(settings=settings, work_dir=work_dir)
+        elapsed = time.perf_counter() - t0
+    st = summary.fetch_stats
+    lat = st.request_seconds
+    result = {
+        "candidates": summary.candidates,
+        "accepted": summary.accepted,
+        "pages": st.pages,
+        "requests": st.requests,
+        "retries": st.retries,
+        "elapsed": elapsed,
+        "peak_rss": _peak_rss_bytes(),
+        "p50": _percentile(lat, 0.50),
+        "p95": _percentile(lat, 0.95),
+        "p99": _percentile(lat, 0.99),
+    }
+    print(SCALE_RESULT_PREFIX + json.dumps(result), flush=True)
+
+
+def scale_test(label_counts: List[int], cfg: MockConfig, min_minutes: int, backoff_scale: float) -> None:
+    """Full pipeline (main) against a local mock server, once per label count.
+
+    The mock server runs in a separate process so it does not compete with the
+    scraper for the GIL, and every label count runs in a fresh child process
+    (scale_run), so its peak RSS belongs to that run alone. Reports throughput,
+    peak RSS and page latency.
+    """
+    script = str(Path(__file__).resolve())
+    cmd = [
+        sys.executable, script, "serve", "--port", "0",
+        "--albums-per-label", str(cfg.albums_per_label), "--page-size", str(cfg.page_size),
+        "--album-kb", str(cfg.album_padding_kb), "--structured-ratio", str(cfg.structured_ratio),
+        "--latency-ms", str(cfg.latency_ms), "--jitter-ms", str(cfg.jitter_ms),
+        "--rate-429", str(cfg.rate_429), "--rate-5xx", str(cfg.rate_5xx), "--seed", str(cfg.seed),
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    rows = []
+    try:
+        first = proc.stdout.readline().split()
+        if len(first) != 2 or first[0] != "MOCK":
+            console.print("[bold red]✖ Mock server nie wystartował[/bold red]")
+            return
+        base_url = f"http://127.0.0.1:{first[1]}"
+
+        for n in label_counts:
+            run = subprocess.run(
+                [
+                    sys.executable, script, "scale-run", "--base-url", base_url, "--labels", str(n),
+                    "--min-minutes", str(min_minutes), "--backoff-scale", str(backoff_scale),
+                ],
+                stdout=subprocess.PIPE,
+                text=True,
+            )
+            lines = [line for line in run.stdout.splitlines() if line.startswith(SCALE_RESULT_PREFIX)]
+            if run.returncode or not lines:
+                console.print(f"[bold red]✖ {n} labeli: przebieg nieudany (kod {run.returncode})[/bold red]")
+                continue
+            r = json.loads(lines[-1][len(SCALE_RESULT_PREFIX):])
+            rows.append((n, r))
+            peak = f"{r['peak_rss'] / 2**20:.1f} MiB" if r["peak_rss"] is not None else "?"
+            console.print(
+                f"• {n} labeli: {r['candidates']} albumów, {r['pages']} stron w {r['elapsed']:.1f}s "
+                f"({r['requests'] / r['elapsed']:.1f} req/s), szczyt RSS {peak}"
+            )
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+    table = Table(title="Scale test (mock Qobuz) — szczyt RSS procesu w MiB, latencja stron w ms")
+    for col in ("labels", "albums", "ok", "req", "retry", "req/s", "alb/s", "rss", "p50", "p95", "p99"):
+        table.add_column(col, justify="right")
+    for n, r in rows:
+        table.add_row(
+            str(n), str(r["candidates"]), str(r["accepted"]), str(r["requests"]), str(r["retries"]),
+            f"{r['requests'] / r['elapsed']:.1f}", f"{r['candidates'] / r['elapsed']:.1f}",
+            f"{r['peak_rss'] / 2**20:.1f}" if r["peak_rss"] is not None else "-",
+            f"{r['p50'] * 1000:.0f}", f"{r['p95'] * 1000:.0f}", f"{r['p99'] * 1000:.0f}",
+        )
+    console.print(table)
+
+
+def cli(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Mock Qobuz server, scale test and benchmarks for web-scraper_16.py")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_mock_args(p: argparse.ArgumentParser) -> None:
+        p.add_argument("--albums-per-label", type=int, default=MockConfig.albums_per_label)
+        p.add_argument("--page-size", type=int, default=MockConfig.page_size, help="album tiles per listing page")
+        p.add_argument("--album-kb", type=int, default=MockConfig.album_padding_kb, help="filler KiB per album page")
+        p.add_argument("--structured-ratio", type=float, default=MockConfig.structured_ratio,
+                       help="share of album pages with JSON-LD")
+        p.add_argument("--latency-ms", type=float, default=MockConfig.latency_ms)
+        p.add_argument("--jitter-ms", type=float, default=MockConfig.jitter_ms)
+        p.add_argument("--rate-429", type=float, default=MockConfig.rate_429, help="share of requests answered 429")
+        p.add_argument("--rate-5xx", type=float, default=MockConfig.rate_5xx, help="share of requests answered 503")
+        p.add_argument("--seed", type=int, default=MockConfig.seed)
+
+    p_mock = sub.add_parser("serve", help="local mock Qobuz server with synthetic labels/albums")
+    p_mock.add_argument("--host", default="127.0.0.1")
+    p_mock.add_argument("--port", type=int, default=8780, help="0 = any free port")
+    add_mock_args(p_mock)
+    p_scale = sub.add_parser("scale-test", help="run the full pipeline against the mock server at growing label counts")
+    p_scale.add_argument("--labels", default="10,50,200", help="comma-separated label counts (default 10,50,200)")
+    p_scale.add_argument("--min-minutes", type=int, default=15)
+    p_scale.add_argument("--backoff-scale", type=float, default=0.05, help="multiplier for retry backoffs")
+    add_mock_args(p_scale)
+    p_run = sub.add_parser("scale-run", help="one scale-test measurement against a running mock server (internal)")
+    p_run.add_argument("--base-url", required=True)
+    p_run.add_argument("--labels", type=int, required=True)
+    p_run.add_argument("--min-minutes", type=int, default=15)
+    p_run.add_argument("--backoff-scale", type=float, default=1.0)
+    p_bench = sub.add_parser("bench-dates", help="benchmark release-date extraction on synthetic listings")
+    p_bench.add_argument("--tiles", type=int, default=60, help="album tiles per listing page")
+    p_bench.add_argument("--pages", type=int, default=50, help="listing pages to parse")
+    p_check = sub.add_parser("check-dates", help="release-date extraction vs the original regexes (exit 1 on mismatch)")
+    p_check.add_argument("--samples", type=int, default=20_000, help="random texts besides the fixed cases")
+    p_check.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == "bench-dates":
+        bench_release_dates(tiles=args.tiles, pages=args.pages)
+    elif args.command == "check-dates":
+        if check_release_dates(args.samples, args.seed):
+            sys.exit(1)
+    elif args.command == "scale-run":
+        scale_run(args.base_url, args.labels, max(0, args.min_minutes), args.backoff_scale)
+    else:
+        cfg = MockConfig(
+            albums_per_label=args.albums_per_label,
+            page_size=max(1, args.page_size),
+            album_padding_kb=args.album_kb,
+            structured_ratio=args.structured_ratio,
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            rate_429=args.rate_429,
+            rate_5xx=args.rate_5xx,
+            seed=args.seed,
+        )
+        if args.command == "serve":
+            serve_mock(args.host, args.port, cfg)
+        else:
+            counts = [int(x) for x in args.labels.split(",") if x.strip()]
+            scale_test(counts, cfg, max(0, args.min_minutes), args.backoff_scale)
+
+
+if __name__ == "__main__":
+    cli()
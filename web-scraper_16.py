@@ -28,11 +28,16 @@ BEHAVIOR
 3) For each candidate album:
    - fetch album page and extract:
        album_title, main_artists, total length (Total length: HH:MM:SS)
+     (embedded JSON-LD MusicAlbum / OpenGraph meta tags are read first; page-text
+      heuristics only fill in the fields they don't provide; the genre is always
+      read from the page text)
    - ALSO extract album-page release date (same patterns as above)
    - if album-page release date is found, it becomes the source of truth and must be
      within the given range; otherwise we fall back to the listing date (already in range)
    - keep only albums where total length >= minimum minutes
    - keep only albums where the FIRST genre category in "About the album" is "Classical"
+   (these filters, plus any "run --filter SPEC", run cheapest and most selective first;
+    album fields are extracted only when a filter needs them)
 
 4) FINAL DEDUPLICATION (right before writing output files):
    - remove duplicates by (album_title, main_artists) within the same label
@@ -42,32 +47,83 @@ BEHAVIOR
 OUTPUT
 ------
 - list_links.txt
-  One album URL per line (after deduplication)
+  One album URL per line (after deduplication); appended live while albums are
+  accepted, so it can be tailed during the run, and rewritten atomically at the end
+
+- accepted_records.jsonl
+  Same records as the XLSX, one JSON object per line (also appended live)
 
 - title_artist_label.xlsx
   Columns (after deduplication):
     album_title | main_artists | label | album_url | release_date
 
+- label_cadence.json
+  Albums/dates seen on each label's listing, used to estimate its release cadence
+  (run --budget N scans busy labels more often than quiet ones), and which of
+  them have been evaluated (the budget goes to albums not evaluated yet)
+
+- watch_records.jsonl, watch_links.txt   (only in: watch)
+  Append-only, kept across restarts; the results API cursor is a record offset
+  in watch_records.jsonl
+
+- <DIR>/run_date=YYYY-MM-DD/part-*.parquet   (only with: run --dataset DIR)
+  One row per processed album: album fields (those extracted before the verdict;
+  a rejected album's page is not fetched just for the dataset), label, listing vs
+  album release date, rejection reason, fetch/parse timings
+
+USAGE
+-----
+    python web-scraper_16.py              # interactive scrape (same as "run")
+    python web-scraper_16.py run --shard 2/4   # only labels of shard 2 of 4 -> shard_2of4.jsonl
+    python web-scraper_16.py run --dataset scrapes  # + per-album Parquet dataset
+    python web-scraper_16.py run --profile prof   # per-stage cProfile/tracemalloc + flamegraph stacks
+    python web-scraper_16.py watch --interval 60   # daemon: re-poll labels, GET http://127.0.0.1:8765/albums?since=0
+    python web-scraper_16.py run --budget 400     # scan labels by learned release cadence, stop after 400 requests
+    python web-scraper_16.py run --filter "genre in Classical,Opera" --filter "label not in X"
+    python web-scraper_16.py merge shard_*.jsonl  # dedup + final list_links.txt / XLSX
+    python web-scraper_16.py compare-structured  # parity check on fixtures/album_pages (exit 1 on mismatch)
+    python web-scraper_16.py compare-structured page1.html ...  # structured data vs text on saved pages
+
+    Mock Qobuz server, scale test and benchmarks live in mock_qobuz.py (same folder).
+
 Dependencies
 ------------
     pip install requests beautifulsoup4 rich openpyxl
+    pip install pyarrow   # optional, Parquet for --dataset (otherwise CSV)
 """
 
 from __future__ import annotations
 
+import argparse
+import codecs
+import cProfile
+import csv
+import hashlib
+import json
+import operator
+import os
 import random
 import re
+import signal
 import sys
+import threading
 import time
-from dataclasses import dataclass
-from datetime import date, datetime
+import tracemalloc
+from collections import Counter, OrderedDict
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from functools import lru_cache, partial
+from html import unescape as html_unescape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from typing import List, Optional, Tuple
-from urllib.parse import urljoin, urlparse, urlunparse
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urljoin, urlparse, urlunparse
 
 import requests
 from bs4 import BeautifulSoup
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Alignment, Font
 from openpyxl.utils import get_column_letter
 from rich.console import Console
@@ -81,6 +137,12 @@ from rich.progress import (
 )
 from rich.prompt import IntPrompt, Prompt
 
+try:  # optional: Parquet output for --dataset (falls back to CSV)
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
 
 console = Console()
 
@@ -90,12 +152,77 @@ OUT_XLSX = "title_artist_label.xlsx"
 OUT_MISSING_ALBUM_DATES = "album_date_missing.txt"
 
 OUT_REJECTED_BY_GENRE = "rejected_by_genre.xlsx"
+OUT_SHARD_TEMPLATE = "shard_{index}of{count}.jsonl"
+OUT_RECORD_LOG = "accepted_records.jsonl"
+OUT_WATCH_RECORD_LOG = "watch_records.jsonl"  # append-only; the results API cursor is a record offset in it
+OUT_WATCH_LINKS = "watch_links.txt"
 REQUEST_TIMEOUT = 20
 RETRIES = 3
+# Responses larger than this are dropped (album/listing pages are well under 1 MiB)
+MAX_RESPONSE_BYTES = 8 * 1024 * 1024
 
 # Hard requirement: max 2 pages per label
 MAX_PAGES_PER_LABEL = 2
 
+# Adaptive label scheduling (run --budget N)
+CADENCE_FILE = "label_cadence.json"
+CADENCE_MAX_KNOWN = 200  # album URLs remembered per label
+CADENCE_MIN_KNOWN = 2  # fewer known releases -> no estimate, label is always scanned
+CADENCE_MIN_SPAN_DAYS = 30
+CADENCE_MAX_DAYS = 60  # scan every label at least this often, whatever its cadence
+
+# Watch mode (long-running, local results API)
+WATCH_MAX_CACHED_ALBUMS = 50_000
+WATCH_API_PAGE_SIZE = 500
+
+# Pipeline stages (run --profile DIR)
+STAGE_LISTING_FETCH = "listing_fetch"
+STAGE_LISTING_PARSE = "listing_parse"
+STAGE_ALBUM_FETCH = "album_fetch"
+STAGE_ALBUM_PARSE = "album_parse"
+STAGE_WRITE_OUTPUTS = "write_outputs"
+PROFILE_SAMPLE_INTERVAL = 0.005
+PROFILE_SNAPSHOT_INTERVAL = 30.0
+PROFILE_TRACEMALLOC_FRAMES = 10
+PROFILE_ALLOC_TOP = 30
+
+# Per-album dataset (run --dataset DIR)
+DATASET_BATCH_ROWS = 1000
+DATASET_COLUMNS = [
+    "album_url", "label", "release_date_listing", "release_date_album", "title", "main_artists",
+    "total_length_hms", "total_seconds", "genre_first", "field_sources", "accepted",
+    "rejection_reason", "fetch_seconds", "parse_seconds", "scraped_at",
+]
+REJECT_FETCH_FAILED = "fetch_failed"
+REJECT_PARSE_FAILED = "parse_failed"
+REJECT_DATE_MISMATCH = "date_out_of_range"
+REJECT_GENRE = "genre"
+REJECT_TOO_SHORT = "too_short"
+REJECT_LABEL = "label"
+REJECT_OVER_BUDGET = "over_budget"  # run --budget spent before the album page was needed
+
+# Filter engine (run --filter SPEC): relative cost of making album fields available
+CANDIDATE_FIELDS = ("label", "listing_date")
+COST_FETCH_PAGE = 1000.0
+COST_STRUCTURED_SCAN = 2.0
+COST_BUILD_SOUP = 40.0
+COST_FILTER_TEST = 0.1
+FIELD_TEXT_COSTS = {"title": 1.0, "main_artists": 8.0, "total_length": 4.0, "release_date": 4.0, "genre_first": 4.0}
+FILTER_COMPARISONS = {
+    ">=": operator.ge,
+    "<=": operator.le,
+    ">": operator.gt,
+    "<": operator.lt,
+}
+RE_FILTER_SPEC = re.compile(r"(genre|label|length|date)\s+(not\s+in|in|>=|<=|>|<)\s+(.+)", re.IGNORECASE)
+
+# Live output sink: fsync after this many records or seconds, whichever comes first
+SINK_FSYNC_EVERY = 25
+SINK_FSYNC_INTERVAL = 5.0
+
+# Excel sheet row limit (incl. header row)
+XLSX_MAX_ROWS = 1_048_576
+
 # Album page contains:
 # "Total length: 00:03:58"
 RE_TOTAL_LENGTH = re.compile(r"Total length:\s*([0-9]{2}:[0-9]{2}:[0-9]{2})", re.IGNORECASE)
@@ -103,14 +230,52 @@ RE_TOTAL_LENGTH = re.compile(r"Total length:\s*([0-9]{2}:[0-9]{2}:[0-9]{2})", re
 # Genre line (used for reference; extraction is from "About the album" section).
 RE_GENRE = re.compile(r"\bGenre:\s*([^\n\r]+)", re.IGNORECASE)
 
-# Release date patterns (listing and album pages)
-RE_RELEASED_BY = re.compile(r"\bReleased by .*? on ([A-Za-z\.]+ \d{1,2}, \d{4})", re.IGNORECASE)
-RE_RELEASED_ON = re.compile(r"\bReleased on ([A-Za-z\.]+ \d{1,2}, \d{4})", re.IGNORECASE)
-RE_TO_BE_RELEASED_MONTH = re.compile(r"\bTo be released on ([A-Za-z\.]+ \d{1,2}, \d{4})", re.IGNORECASE)
-RE_TO_BE_RELEASED_NUM = re.compile(r"\bTo be released on (\d{1,2}/\d{1,2}/\d{2,4})", re.IGNORECASE)
-RE_RELEASED_BY_NUM = re.compile(r"\bReleased by .*? on (\d{1,2}/\d{1,2}/\d{2,4})", re.IGNORECASE)
-RE_RELEASED_ON_NUM = re.compile(r"\bReleased on (\d{1,2}/\d{1,2}/\d{2,4})", re.IGNORECASE)
+# Structured data embedded in album pages (scanned without building a DOM)
+RE_LD_JSON = re.compile(
+    r"<script[^>]*type=[\"']application/ld\+json[\"'][^>]*>(.*?)</script>", re.IGNORECASE | re.DOTALL
+)
+RE_META_TAG = re.compile(r"<meta\s[^>]*>", re.IGNORECASE)
+RE_TAG_ATTR = re.compile(r"([\w:-]+)\s*=\s*(?:\"([^\"]*)\"|'([^']*)')")
+RE_ISO_DURATION = re.compile(
+    r"P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+(?:\.\d+)?)S)?)?", re.IGNORECASE
+)
+
+RE_META_CHARSET = re.compile(rb"<meta[^>]+charset=[\"']?([A-Za-z0-9_\-:.]+)", re.IGNORECASE)
+
+ALBUM_FIELDS = ("title", "main_artists", "total_length", "release_date", "genre_first")
+STRUCTURED_FIELDS = ("title", "main_artists", "total_length", "release_date")  # genre_first: text only
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures" / "album_pages"
+FIXTURES_EXPECTED = "expected.json"
+
+# Release date phrases (listing and album pages), matched in a single scan:
+#   "Released by ... on <date>", "Released on <date>", "To be released on <date>"
+# where <date> is either "Jan 30, 2026" (month name) or "1/30/26" (numeric).
+# "Released by ... on" looks for a month-name date first, however far, then a numeric one.
+_RE_MONTH_DATE_SRC = r"[A-Za-z\.]+\s+\d{1,2},\s+\d{4}"
+_RE_NUMERIC_DATE_SRC = r"\d{1,2}/\d{1,2}/\d{2,4}"
+RE_RELEASE_PHRASE = re.compile(
+    rf"\b(?:Released\s+by\s.*?\son\s+(?P<by_month>{_RE_MONTH_DATE_SRC})"
+    rf"|Released\s+by\s.*?\son\s+(?P<by_num>{_RE_NUMERIC_DATE_SRC})"
+    rf"|(?:Released|To\s+be\s+released)\s+on\s+(?:(?P<on_month>{_RE_MONTH_DATE_SRC})|(?P<on_num>{_RE_NUMERIC_DATE_SRC})))",
+    re.IGNORECASE | re.DOTALL,
+)
 
+# Phrase priority when several phrases are present: month-name dates before numeric ones,
+# "Released by" before "Released on" / "To be released on"; among equals the first occurrence
+# wins ("To be released on" contains "released on", so the two phrases share a rank).
+_PHRASE_RANK = {"by_month": 0, "on_month": 1, "by_num": 2, "on_num": 3}
+
+RE_MONTH_DATE = re.compile(r"([A-Za-z\.]+) (\d{1,2}), (\d{4})")
+RE_NUMERIC_DATE = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{2,4})")
+
+_MONTH_NAMES = (
+    "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december",
+)
+# "jan"/"january"/"sept" -> month number (lookup is done on casefolded, dot-less tokens)
+MONTH_LOOKUP = {name: i for i, name in enumerate(_MONTH_NAMES, start=1)}
+MONTH_LOOKUP.update({name[:3]: i for i, name in enumerate(_MONTH_NAMES, start=1)})
+MONTH_LOOKUP["sept"] = 9
 
 @dataclass(frozen=True)
 class LabelSource:
@@ -133,6 +298,47 @@ class AlbumDetails:
     total_seconds: int
     release_date_album: Optional[date]
     genre_first: Optional[str]
+    # field -> "json-ld" | "meta" | "text" | "missing"
+    field_sources: Dict[str, str] = field(default_factory=dict, compare=False, hash=False)
+
+
+@dataclass(frozen=True)
+class FetchedPage:
+    url: str
+    content: bytes
+    encoding: str
+
+
+@dataclass
+class FetchStats:
+    requests: int = 0  # HTTP attempts, retries included (what run --budget counts)
+    pages: int = 0
+    bytes_total: int = 0
+    too_large: int = 0
+    retries: int = 0  # 429 / 5xx / network errors that were retried
+    decode_seconds: float = 0.0
+    # largest raw body + decoded text held for a single page
+    peak_page_bytes: int = 0
+    # per successful page: seconds from first attempt to full body (incl. retries)
+    request_seconds: List[float] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class RunSettings:
+    start_date: date
+    end_date: date
+    min_minutes: int
+    delay_list: float
+    delay_album: float
+    backoff_scale: float = 1.0  # multiplier for retry waits after 429/5xx/network errors
+
+
+@dataclass
+class RunSummary:
+    labels_scanned: int
+    candidates: int
+    accepted: int
+    fetch_stats: FetchStats
 
 
 @dataclass(frozen=True)
@@ -153,46 +359,56 @@ def _norm_month_token(s: str) -> str:
     return s.replace(".", "")
 
 
-def parse_english_month_date(s: str) -> Optional[date]:
-    s = " ".join((s or "").split()).strip()
-    if not s:
+def _safe_date(year: int, month: int, day: int) -> Optional[date]:
+    if not (1 <= month <= 12 and 1 <= day <= 31):
+        return None
+    try:
+        return date(year, month, day)
+    except ValueError:  # e.g. Feb 30
         return None
 
-    # normalize common oddities
-    s = s.replace("Sept ", "Sep ")
-    # remove dots in month abbreviations (Jan., Feb., etc.)
-    parts = s.split(" ", 1)
-    if parts:
-        parts[0] = _norm_month_token(parts[0])
-        s = " ".join(parts)
 
-    for fmt in ("%b %d, %Y", "%B %d, %Y"):
-        try:
-            return datetime.strptime(s, fmt).date()
-        except ValueError:
-            pass
-    return None
+@lru_cache(maxsize=4096)
+def _parse_month_date_norm(s: str) -> Optional[date]:
+    m = RE_MONTH_DATE.fullmatch(s)
+    if not m:
+        return None
+    month = MONTH_LOOKUP.get(_norm_month_token(m.group(1)).casefold())
+    if month is None:
+        return None
+    return _safe_date(int(m.group(3)), month, int(m.group(2)))
 
 
-def parse_numeric_us_date(s: str) -> Optional[date]:
-    s = " ".join((s or "").split()).strip()
-    if not s:
+@lru_cache(maxsize=4096)
+def _parse_numeric_date_norm(s: str) -> Optional[date]:
+    m = RE_NUMERIC_DATE.fullmatch(s)
+    if not m:
+        return None
+    a, b, y = m.groups()
+    if len(y) == 2:
+        # same pivot as strptime's %y: 69-99 -> 1900s, 00-68 -> 2000s
+        year = int(y) + (1900 if int(y) >= 69 else 2000)
+    elif len(y) == 4:
+        year = int(y)
+    else:
         return None
 
-    for fmt in ("%m/%d/%y", "%m/%d/%Y"):
-        try:
-            return datetime.strptime(s, fmt).date()
-        except ValueError:
-            pass
+    # us-en is M/D/Y; heuristic fallback to D/M/Y (rare for us-en, but safe)
+    return _safe_date(year, int(a), int(b)) or _safe_date(year, int(b), int(a))
 
-    # heuristic fallback: if it looks like dd/mm/yy (rare for us-en, but safe)
-    for fmt in ("%d/%m/%y", "%d/%m/%Y"):
-        try:
-            return datetime.strptime(s, fmt).date()
-        except ValueError:
-            pass
 
-    return None
+def parse_english_month_date(s: str) -> Optional[date]:
+    s = " ".join((s or "").split())
+    if not s:
+        return None
+    return _parse_month_date_norm(s)
+
+
+def parse_numeric_us_date(s: str) -> Optional[date]:
+    s = " ".join((s or "").split())
+    if not s:
+        return None
+    return _parse_numeric_date_norm(s)
 
 
 def extract_release_date_from_text(text: str) -> Optional[date]:
@@ -201,24 +417,28 @@ def extract_release_date_from_text(text: str) -> Optional[date]:
     Supports both:
       - Month-name formats: "Jan 30, 2026"
       - Numeric formats (common on album pages, especially us-en): "1/30/26"
+
+    All phrases are found in one pass over the text; when several are present the
+    highest-priority one wins (month-name before numeric, then "Released by" before
+    "Released on" / "To be released on"), first occurrence first.
     """
     if not text:
         return None
-    t = " ".join(text.split())
-
-    # Month-name formats
-    for rx in (RE_RELEASED_BY, RE_RELEASED_ON, RE_TO_BE_RELEASED_MONTH):
-        m = rx.search(t)
-        if m:
-            return parse_english_month_date(m.group(1))
 
-    # Numeric formats
-    for rx in (RE_RELEASED_BY_NUM, RE_RELEASED_ON_NUM, RE_TO_BE_RELEASED_NUM):
-        m = rx.search(t)
-        if m:
-            return parse_numeric_us_date(m.group(1))
+    best = None
+    best_rank = len(_PHRASE_RANK)
+    for m in RE_RELEASE_PHRASE.finditer(text):
+        rank = _PHRASE_RANK[m.lastgroup]
+        if rank < best_rank:
+            best, best_rank = m, rank
+            if rank == 0:
+                break
 
-    return None
+    if best is None:
+        return None
+    if best.lastgroup.endswith("_month"):
+        return parse_english_month_date(best.group(best.lastgroup))
+    return parse_numeric_us_date(best.group(best.lastgroup))
 
 
 def hms_to_seconds(hms: str) -> Optional[int]:
@@ -297,33 +517,99 @@ def polite_sleep(base_seconds: float, jitter_max: float = 0.25) -> None:
     time.sleep(base_seconds + random.uniform(0, max(0.0, jitter_max)))
 
 
-def fetch_html(session: requests.Session, url: str) -> Optional[str]:
+def _charset_from_content_type(content_type: str) -> Optional[str]:
+    for part in (content_type or "").split(";")[1:]:
+        key, _, value = part.partition("=")
+        if key.strip().lower() == "charset" and value.strip():
+            return value.strip().strip("\"'")
+    return None
+
+
+def declared_encoding(content: bytes, content_type: str) -> str:
+    """Encoding from the Content-Type header, else from <meta charset>, else UTF-8 (no sniffing)."""
+    enc = _charset_from_content_type(content_type)
+    if not enc:
+        m = RE_META_CHARSET.search(content[:4096])
+        if m:
+            enc = m.group(1).decode("ascii", "ignore")
+    if enc:
+        try:
+            return codecs.lookup(enc).name
+        except LookupError:
+            pass
+    return "utf-8"
+
+
+def page_text(page: FetchedPage, stats: Optional[FetchStats] = None) -> str:
+    """Decode a fetched page exactly once with its declared encoding."""
+    t0 = time.perf_counter()
+    text = page.content.decode(page.encoding, errors="replace")
+    if stats is not None:
+        stats.decode_seconds += time.perf_counter() - t0
+        stats.peak_page_bytes = max(stats.peak_page_bytes, len(page.content) + sys.getsizeof(text))
+    return text
+
+
+def fetch_page(
+    session: requests.Session,
+    url: str,
+    stats: Optional[FetchStats] = None,
+    backoff_scale: float = 1.0,
+) -> Optional[FetchedPage]:
+    """GET with retries on 429/5xx/network errors; retry waits are multiplied by `backoff_scale`."""
     last_err = None
+    t_start = time.perf_counter()
     for attempt in range(1, RETRIES + 1):
+        if stats is not None:
+            stats.requests += 1
         try:
-            resp = session.get(url, timeout=REQUEST_TIMEOUT)
-
-            if resp.status_code == 429:
-                backoff = 8 + attempt * 6 + random.uniform(0, 4)
-                console.print(f"[bold yellow]⏳ 429 Too Many Requests[/bold yellow] → czekam ~{backoff:.0f}s")
-                time.sleep(backoff)
-                continue
-
-            if 500 <= resp.status_code < 600:
-                backoff = 2 + attempt * 2 + random.uniform(0, 2)
-                console.print(f"[bold yellow]⚠️ HTTP {resp.status_code}[/bold yellow] → retry za ~{backoff:.0f}s")
-                time.sleep(backoff)
-                continue
+            with session.get(url, timeout=REQUEST_TIMEOUT, stream=True) as resp:
+                if resp.status_code == 429:
+                    backoff = (8 + attempt * 6 + random.uniform(0, 4)) * backoff_scale
+                    if stats is not None:
+                        stats.retries += 1
+                    console.print(f"[bold yellow]⏳ 429 Too Many Requests[/bold yellow] → czekam ~{backoff:.0f}s")
+                    time.sleep(backoff)
+                    continue
 
-            if resp.status_code != 200:
-                console.print(f"[bold yellow]⚠️ HTTP {resp.status_code}[/bold yellow] dla {url}")
-                return None
+                if 500 <= resp.status_code < 600:
+                    backoff = (2 + attempt * 2 + random.uniform(0, 2)) * backoff_scale
+                    if stats is not None:
+                        stats.retries += 1
+                    console.print(f"[bold yellow]⚠️ HTTP {resp.status_code}[/bold yellow] → retry za ~{backoff:.0f}s")
+                    time.sleep(backoff)
+                    continue
 
-            return resp.text
+                if resp.status_code != 200:
+                    console.print(f"[bold yellow]⚠️ HTTP {resp.status_code}[/bold yellow] dla {url}")
+                    return None
+
+                declared_len = resp.headers.get("Content-Length", "")
+                if declared_len.isdigit() and int(declared_len) > MAX_RESPONSE_BYTES:
+                    return _reject_too_large(url, stats)
+
+                buf = bytearray()
+                for chunk in resp.iter_content(chunk_size=64 * 1024):
+                    buf += chunk
+                    if len(buf) > MAX_RESPONSE_BYTES:
+                        return _reject_too_large(url, stats)
+
+                content = bytes(buf)
+                if stats is not None:
+                    stats.pages += 1
+                    stats.bytes_total += len(content)
+                    stats.request_seconds.append(time.perf_counter() - t_start)
+                return FetchedPage(
+                    url=url,
+                    content=content,
+                    encoding=declared_encoding(content, resp.headers.get("Content-Type", "")),
+                )
 
         except requests.exceptions.RequestException as e:
             last_err = e
-            backoff = 1 + attempt * 2 + random.uniform(0, 2)
+            backoff = (1 + attempt * 2 + random.uniform(0, 2)) * backoff_scale
+            if stats is not None:
+                stats.retries += 1
             console.print(
                 f"[bold yellow]⚠️ Problem sieciowy[/bold yellow] (próba {attempt}/{RETRIES}) → retry za ~{backoff:.0f}s"
             )
@@ -334,6 +620,25 @@ def fetch_html(session: requests.Session, url: str) -> Optional[str]:
     return None
 
 
+def _reject_too_large(url: str, stats: Optional[FetchStats]) -> None:
+    if stats is not None:
+        stats.too_large += 1
+    console.print(
+        f"[bold yellow]⚠️ Odpowiedź większa niż {MAX_RESPONSE_BYTES // (1024 * 1024)} MiB[/bold yellow] → pomijam {url}"
+    )
+    return None
+
+
+def fetch_html(
+    session: requests.Session,
+    url: str,
+    stats: Optional[FetchStats] = None,
+    backoff_scale: float = 1.0,
+) -> Optional[str]:
+    page = fetch_page(session, url, stats, backoff_scale)
+    return page_text(page, stats) if page else None
+
+
 def listing_has_page2(soup: BeautifulSoup, label_url: str) -> bool:
     """Best-effort detection whether /page/2 exists in pagination."""
     base = normalize_label_base(label_url)
@@ -400,7 +705,18 @@ def extract_album_candidates_from_listing(
     end: date,
 ) -> List[Candidate]:
     """Strict mode: if release date can't be read from listing, skip the album."""
-    soup = BeautifulSoup(html, "html.parser")
+    return extract_album_candidates_from_soup(BeautifulSoup(html, "html.parser"), page_url, label_name, start, end)
+
+
+def extract_album_candidates_from_soup(
+    soup: BeautifulSoup,
+    page_url: str,
+    label_name: str,
+    start: date,
+    end: date,
+    observed: Optional[List[Tuple[str, date]]] = None,
+) -> List[Candidate]:
+    """Candidates within [start, end]; every dated tile is also appended to `observed`, if given."""
     out: List[Candidate] = []
     seen_page_urls = set()
 
@@ -417,6 +733,8 @@ def extract_album_candidates_from_listing(
         rel = extract_listing_release_date_for_link(a, page_url=page_url, album_url=album_url)
         if not rel:
             continue
+        if observed is not None:
+            observed.append((album_url, rel))
 
         if start <= rel <= end:
             out.append(Candidate(album_url=album_url, label_name=label_name, release_date_listing=rel))
@@ -430,6 +748,23 @@ def _clean_line_prefix(s: str) -> str:
     return re.sub(r"^[\s#*\-•]+", "", (s or "").strip()).strip()
 
 
+def _first_genre_category(raw: str) -> Optional[str]:
+    """First category of a genre taxonomy string, e.g. "Classical / Chamber Music" -> "Classical"."""
+    raw = " ".join((raw or "").split())
+    if raw.casefold().startswith("classical"):
+        return "Classical"
+
+    # Split by common delimiters used by Qobuz (in some locales)
+    for delim in ("/", ",", "|", "›", ">"):
+        if delim in raw:
+            first = raw.split(delim, 1)[0].strip()
+            return first or None
+
+    # Fallback: first token
+    first = raw.split(" ", 1)[0].strip()
+    return first or None
+
+
 def parse_album_first_genre(soup: BeautifulSoup) -> Optional[str]:
     """Extract the FIRST genre category from the *About the album* section.
 
@@ -489,19 +824,7 @@ def parse_album_first_genre(soup: BeautifulSoup) -> Optional[str]:
             first = tags[0].strip()
             return first or None
 
-        raw_cf = raw.casefold()
-        if raw_cf.startswith("classical"):
-            return "Classical"
-
-        # Split by common delimiters used by Qobuz (in some locales)
-        for delim in ("/", ",", "|", "›", ">"):
-            if delim in raw:
-                first = raw.split(delim, 1)[0].strip()
-                return first or None
-
-        # Fallback: first token
-        first = raw.split(" ", 1)[0].strip()
-        return first or None
+        return _first_genre_category(raw)
 
     return None
 
@@ -529,21 +852,18 @@ def parse_album_release_date(soup: BeautifulSoup) -> Optional[date]:
     return extract_release_date_from_text(" ".join(lines))
 
 
-def parse_album_details(html: str) -> Optional[AlbumDetails]:
-    soup = BeautifulSoup(html, "html.parser")
-
+def _parse_album_title(soup: BeautifulSoup) -> str:
     # Title: from H1, strip " by ..." if present
-    title = ""
     h1 = soup.find("h1")
-    if h1:
-        t = h1.get_text(" ", strip=True)
-        if " by " in t:
-            title = t.split(" by ", 1)[0].strip()
-        else:
-            title = t.strip()
+    if not h1:
+        return ""
+    t = h1.get_text(" ", strip=True)
+    if " by " in t:
+        return t.split(" by ", 1)[0].strip()
+    return t.strip()
+
 
-    # Main artists
-    main_artists = ""
+def _parse_album_main_artists(soup: BeautifulSoup) -> str:
     main_block = None
     for tag in soup.find_all(["li", "p", "div"]):
         txt = tag.get_text(" ", strip=True)
@@ -551,42 +871,947 @@ def parse_album_details(html: str) -> Optional[AlbumDetails]:
             main_block = tag
             break
 
-    if main_block:
-        artists = [aa.get_text(" ", strip=True) for aa in main_block.find_all("a") if aa.get_text(strip=True)]
-        if artists:
-            main_artists = ", ".join(artists).strip()
-        else:
-            main_artists = main_block.get_text(" ", strip=True).split(":", 1)[-1].strip()
+    if not main_block:
+        return ""
+
+    artists = [aa.get_text(" ", strip=True) for aa in main_block.find_all("a") if aa.get_text(strip=True)]
+    if artists:
+        return ", ".join(artists).strip()
+    return main_block.get_text(" ", strip=True).split(":", 1)[-1].strip()
+
 
-    # Total length
-    page_text = soup.get_text("\n", strip=True)
-    m = RE_TOTAL_LENGTH.search(page_text)
+def _parse_album_total_length(soup: BeautifulSoup) -> Optional[Tuple[str, int]]:
+    m = RE_TOTAL_LENGTH.search(soup.get_text("\n", strip=True))
     if not m:
         return None
-
     total_hms = m.group(1).strip()
     total_seconds = hms_to_seconds(total_hms)
     if total_seconds is None:
         return None
+    return total_hms, total_seconds
+
+
+def _iso_duration_to_seconds(s: str) -> Optional[int]:
+    m = RE_ISO_DURATION.fullmatch((s or "").strip())
+    if not m or not any(m.groups()):
+        return None
+    d, h, mi, sec = (float(g) if g else 0.0 for g in m.groups())
+    return int(round(d * 86400 + h * 3600 + mi * 60 + sec))
+
+
+def _seconds_to_hms(total: int) -> str:
+    return f"{total // 3600:02d}:{total % 3600 // 60:02d}:{total % 60:02d}"
+
+
+def _iso_date(s: str) -> Optional[date]:
+    try:
+        return date.fromisoformat((s or "").strip()[:10])
+    except ValueError:
+        return None
+
+
+def _ld_names(value) -> List[str]:
+    """Names from a JSON-LD value that may be a string, an object or a list of either."""
+    items = value if isinstance(value, list) else [value]
+    out = []
+    for it in items:
+        name = it.get("name") if isinstance(it, dict) else it
+        if isinstance(name, str) and name.strip():
+            out.append(" ".join(name.split()))
+    return out
+
+
+def _iter_ld_nodes(data):
+    if isinstance(data, list):
+        for it in data:
+            yield from _iter_ld_nodes(it)
+    elif isinstance(data, dict):
+        yield data
+        if "@graph" in data:
+            yield from _iter_ld_nodes(data["@graph"])
+
+
+def _find_ld_album(html: str) -> Optional[dict]:
+    for m in RE_LD_JSON.finditer(html):
+        try:
+            data = json.loads(m.group(1))
+        except ValueError:
+            continue
+        for node in _iter_ld_nodes(data):
+            types = node.get("@type")
+            types = types if isinstance(types, list) else [types]
+            if "MusicAlbum" in types:
+                return node
+    return None
+
+
+def _meta_properties(html: str) -> Dict[str, str]:
+    """First content value per <meta property=...|name=...> tag."""
+    out: Dict[str, str] = {}
+    for m in RE_META_TAG.finditer(html):
+        attrs = {k.lower(): html_unescape(v1 or v2) for k, v1, v2 in RE_TAG_ATTR.findall(m.group(0))}
+        key = (attrs.get("property") or attrs.get("name") or "").strip().lower()
+        if key and "content" in attrs and key not in out:
+            out[key] = attrs["content"].strip()
+    return out
+
+
+def extract_structured_album_fields(html: str) -> Dict[str, Tuple[object, str]]:
+    """Read album fields from embedded structured data without building a DOM.
+
+    Sources, in order of preference:
+      - JSON-LD ``MusicAlbum`` node (name, byArtist, duration, datePublished)
+      - OpenGraph/meta tags (og:title when og:type is music.album, music:release_date,
+        music:duration)
+
+    Returns {field: (value, source)} for the fields that were found; field names are
+    "title", "main_artists", "total_length", "release_date". "genre_first" is never
+    taken from here: JSON-LD ``genre`` can be only the subgenre (see
+    parse_album_first_genre), so it always comes from "About the album".
+    """
+    out: Dict[str, Tuple[object, str]] = {}
+    if not html:
+        return out
+
+    album = _find_ld_album(html) if "application/ld+json" in html else None
+    if album:
+        title = _ld_names(album.get("name"))
+        if title:
+            out["title"] = (title[0], "json-ld")
+        artists = _ld_names(album.get("byArtist"))
+        if artists:
+            out["main_artists"] = (", ".join(artists), "json-ld")
+        secs = _iso_duration_to_seconds(str(album.get("duration") or ""))
+        if secs is not None:
+            out["total_length"] = ((_seconds_to_hms(secs), secs), "json-ld")
+        rel = _iso_date(str(album.get("datePublished") or album.get("releaseDate") or ""))
+        if rel:
+            out["release_date"] = (rel, "json-ld")
+
+    if len(out) < len(STRUCTURED_FIELDS):
+        meta = _meta_properties(html)
+        if "title" not in out and meta.get("og:type") == "music.album" and meta.get("og:title"):
+            out["title"] = (meta["og:title"], "meta")
+        if "release_date" not in out:
+            rel = _iso_date(meta.get("music:release_date", ""))
+            if rel:
+                out["release_date"] = (rel, "meta")
+        if "total_length" not in out and meta.get("music:duration", "").isdigit():
+            secs = int(meta["music:duration"])
+            out["total_length"] = ((_seconds_to_hms(secs), secs), "meta")
+
+    return out
+
+
+# Text-heuristic extractor per album field (used for fields structured data doesn't provide)
+ALBUM_TEXT_PARSERS = {
+    "title": _parse_album_title,
+    "main_artists": _parse_album_main_artists,
+    "total_length": _parse_album_total_length,
+    "release_date": parse_album_release_date,
+    "genre_first": parse_album_first_genre,
+}
+
+
+class _AlbumUnavailable(Exception):
+    """Album page could not be fetched, or lacks a field every album must have."""
+
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+class LazyAlbum:
+    """Album fields extracted on first use.
+
+    The album page is fetched only when an album field is needed, structured data is
+    scanned once, and the BeautifulSoup tree is built only if a needed field is not
+    in the structured data. Candidate fields ("label", "listing_date") and `known`
+    fields cost nothing.
+    """
+
+    def __init__(
+        self,
+        cand: Optional[Candidate],
+        fetch: Optional[Callable[[], Optional[str]]] = None,
+        html: Optional[str] = None,
+        profiler: Optional[NullProfiler] = None,
+        use_structured: bool = True,
+        known: Optional[Dict[str, Tuple[object, str]]] = None,
+    ) -> None:
+        self.cand = cand
+        self._fetch = fetch
+        self._html = html
+        self._page_loaded = html is not None
+        self._profiler = profiler or NullProfiler()
+        # {} = structured data already scanned (or skipped): every field comes from the text
+        self._structured: Optional[Dict[str, Tuple[object, str]]] = None if use_structured else {}
+        self._soup: Optional[BeautifulSoup] = None
+        # fields from an earlier snapshot() (watch cache): used as is, the page is fetched only for the rest
+        self._values: Dict[str, object] = {name: value for name, (value, _) in (known or {}).items()}
+        self.sources: Dict[str, str] = {name: src for name, (_, src) in (known or {}).items()}
+        self.fetch_seconds = 0.0
+        self.parse_seconds = 0.0
+
+    @property
+    def fetched(self) -> bool:
+        """True once a request for the album page was made (for polite delays)."""
+        return self._page_loaded and self._fetch is not None
+
+    def has(self, name: str) -> bool:
+        return name in self._values
+
+    def snapshot(self) -> Dict[str, Tuple[object, str]]:
+        """{field: (value, source)} for the fields extracted so far; never fetches or parses."""
+        return {name: (value, self.sources.get(name, "")) for name, value in self._values.items()}
+
+    def cost(self, fields: Iterable[str]) -> float:
+        """Estimated work to make `fields` available (0 if they already are)."""
+        c = 0.0
+        need_page = need_soup = False
+        for name in fields:
+            if name in CANDIDATE_FIELDS or name in self._values:
+                continue
+            need_page = True
+            if self._structured is not None and name in self._structured:
+                continue
+            need_soup = True
+            c += FIELD_TEXT_COSTS[name]
+        if need_page and not self._page_loaded:
+            c += COST_FETCH_PAGE
+        if need_page and self._structured is None:
+            c += COST_STRUCTURED_SCAN
+        if need_soup and self._soup is None:
+            c += COST_BUILD_SOUP
+        return c
+
+    def _page(self) -> str:
+        if not self._page_loaded:
+            self._page_loaded = True
+            t0 = time.perf_counter()
+            with self._profiler.stage(STAGE_ALBUM_FETCH):
+                self._html = self._fetch() if self._fetch else None
+            self.fetch_seconds += time.perf_counter() - t0
+        if not self._html:
+            raise _AlbumUnavailable(REJECT_FETCH_FAILED)
+        return self._html
+
+    def get(self, name: str):
+        if name == "label":
+            return self.cand.label_name
+        if name == "listing_date":
+            return self.cand.release_date_listing
+        if name in self._values:
+            value = self._values[name]
+        else:
+            value = self._extract(name)
+        if name == "total_length" and not value:
+            raise _AlbumUnavailable(REJECT_PARSE_FAILED)
+        return value
+
+    def _extract(self, name: str):
+        html = self._page() if self._structured is None or name not in self._structured else ""
+        t0 = time.perf_counter()
+        with self._profiler.stage(STAGE_ALBUM_PARSE):
+            if self._structured is None:
+                self._structured = extract_structured_album_fields(html)
+            if name in self._structured:
+                value, src = self._structured[name]
+            else:
+                if self._soup is None:
+                    self._soup = BeautifulSoup(html, "html.parser")
+                value = ALBUM_TEXT_PARSERS[name](self._soup)
+                src = "text" if value else "missing"
+        self.parse_seconds += time.perf_counter() - t0
+
+        self._values[name] = value
+        self.sources[name] = src
+        return value
+
+    def check_usable(self) -> None:
+        """Raise _AlbumUnavailable(parse_failed) for a page without total length, or without both title and artists."""
+        self.get("total_length")
+        if not (self.get("title") or self.get("main_artists")):
+            raise _AlbumUnavailable(REJECT_PARSE_FAILED)
+
+    def details(self) -> Optional[AlbumDetails]:
+        """All album fields as AlbumDetails; None if the page is missing or unusable."""
+        try:
+            self.check_usable()
+            total_hms, total_seconds = self.get("total_length")
+            title = self.get("title") or ""
+            main_artists = self.get("main_artists") or ""
+            return AlbumDetails(
+                title=title,
+                main_artists=main_artists,
+                total_length_hms=total_hms,
+                total_seconds=total_seconds,
+                release_date_album=self.get("release_date"),
+                genre_first=self.get("genre_first"),
+                field_sources=dict(self.sources),
+            )
+        except _AlbumUnavailable:
+            return None
+
+
+def parse_album_details(html: str, use_structured: bool = True) -> Optional[AlbumDetails]:
+    """Album fields from structured data when present, text heuristics for the rest."""
+    return LazyAlbum(None, html=html, use_structured=use_structured).details()
+
+
+@dataclass(frozen=True)
+class AlbumFilter:
+    """One album-phase filter: `test` gets the values of `fields` (in order), True = keep."""
+
+    name: str
+    fields: Tuple[str, ...]
+    test: Callable[..., bool]
+    reason: str
+
+
+def date_window_filter(start: date, end: date, op: str = "between") -> AlbumFilter:
+    """Album-page release date (listing date if the page has none) within [start, end]."""
+    if op == "between":
+        name = f"date in {start:%d.%m.%Y}–{end:%d.%m.%Y}"
+    else:
+        name = f"date {op} {(start if op.startswith('>') else end):%d.%m.%Y}"
+    return AlbumFilter(
+        name=name,
+        fields=("release_date", "listing_date"),
+        test=lambda album_date, listing_date: start <= (album_date or listing_date) <= end,
+        reason=REJECT_DATE_MISMATCH,
+    )
+
+
+def rolling_date_filter(days_back: int, days_ahead: int) -> AlbumFilter:
+    """date_window_filter over [today - days_back, today + days_ahead], with "today" taken at test time (watch)."""
+
+    def test(album_date: Optional[date], listing_date: date) -> bool:
+        today = date.today()
+        return today - timedelta(days=days_back) <= (album_date or listing_date) <= today + timedelta(days=days_ahead)
+
+    return AlbumFilter(
+        name=f"date in today−{days_back}d…today+{days_ahead}d",
+        fields=("release_date", "listing_date"),
+        test=test,
+        reason=REJECT_DATE_MISMATCH,
+    )
+
+
+def genre_filter(genres: Iterable[str], exclude: bool = False) -> AlbumFilter:
+    """First genre category starts with one of `genres` (case-insensitive); missing genre never matches."""
+    wanted = tuple(g.strip().casefold() for g in genres if g.strip())
+
+    def test(genre_first: Optional[str]) -> bool:
+        g = (genre_first or "").strip().casefold()
+        return (bool(g) and g.startswith(wanted)) != exclude
+
+    return AlbumFilter(
+        name=f"genre {'not in' if exclude else 'in'} {{{', '.join(genres)}}}",
+        fields=("genre_first",),
+        test=test,
+        reason=REJECT_GENRE,
+    )
+
+
+def length_filter(op: str, minutes: int) -> AlbumFilter:
+    cmp = FILTER_COMPARISONS[op]
+    return AlbumFilter(
+        name=f"length {op} {minutes} min",
+        fields=("total_length",),
+        test=lambda total_length: cmp(total_length[1], minutes * 60),
+        reason=REJECT_TOO_SHORT,
+    )
+
+
+def label_filter(labels: Iterable[str], exclude: bool = False) -> AlbumFilter:
+    keys = {norm_key(l) for l in labels}
+    return AlbumFilter(
+        name=f"label {'not in' if exclude else 'in'} {{{', '.join(labels)}}}",
+        fields=("label",),
+        test=lambda label: (norm_key(label) in keys) != exclude,
+        reason=REJECT_LABEL,
+    )
+
+
+def parse_filter_spec(spec: str) -> AlbumFilter:
+    """"genre in Classical,Opera" | "label not in A,B" | "length >= 20" | "date <= 31.12.2026" -> AlbumFilter."""
+    m = RE_FILTER_SPEC.fullmatch(spec.strip())
+    if not m:
+        raise argparse.ArgumentTypeError(
+            f"niepoprawny filtr {spec!r} (np. 'genre in Classical,Opera', 'length >= 20', 'label not in X')"
+        )
+    name, op, value = m.group(1).lower(), " ".join(m.group(2).lower().split()), m.group(3).strip()
+    try:
+        if name in ("genre", "label") and op in ("in", "not in"):
+            items = [v.strip() for v in value.split(",") if v.strip()]
+            if items:
+                make = genre_filter if name == "genre" else label_filter
+                return make(items, exclude=(op == "not in"))
+        elif name == "length" and op in FILTER_COMPARISONS:
+            return length_filter(op, int(value))
+        elif name == "date" and op in (">=", "<="):
+            d = parse_pl_date(value)
+            return date_window_filter(d, date.max, op) if op == ">=" else date_window_filter(date.min, d, op)
+    except ValueError:
+        pass
+    raise argparse.ArgumentTypeError(f"nieobsługiwany filtr {spec!r}")
+
+
+def default_album_filters(
+    date_filter: AlbumFilter,
+    min_minutes: int,
+    extra: Iterable[AlbumFilter] = (),
+) -> List[AlbumFilter]:
+    """Date window (`date_filter`) + "Classical" first genre + minimum length, plus `extra` filters.
+
+    An extra genre or length filter replaces the default one for that field.
+    """
+    extra = list(extra)
+    filters = [date_filter]
+    if not any("genre_first" in f.fields for f in extra):
+        filters.append(genre_filter(["Classical"]))
+    if not any("total_length" in f.fields for f in extra):
+        filters.append(length_filter(">=", min_minutes))
+    return filters + extra
+
+
+class FilterEngine:
+    """Evaluates album filters in cost/selectivity order.
+
+    At each step the next filter is the one with the lowest (marginal extraction cost
+    / observed rejection rate), so filters that can run without the album page (label)
+    go first and the page is only parsed as far as the remaining filters need.
+    Rejection rates are learned from the albums seen so far in this engine.
+
+    Once a filter has needed the album page, the page must be usable (see
+    LazyAlbum.check_usable) before the album counts as rejected or accepted.
+    Otherwise it is a parse failure, as when album details were parsed up front.
+    """
+
+    def __init__(self, filters: Iterable[AlbumFilter]) -> None:
+        self.filters = list(filters)
+        self.evaluated: Dict[str, int] = {f.name: 0 for f in self.filters}
+        self.rejected: Dict[str, int] = {f.name: 0 for f in self.filters}
+        self.unavailable: Counter = Counter()  # fetch_failed / parse_failed
+
+    def _rank(self, f: AlbumFilter, album: LazyAlbum) -> float:
+        reject_rate = (self.rejected[f.name] + 1) / (self.evaluated[f.name] + 2)
+        return (album.cost(f.fields) + COST_FILTER_TEST) / reject_rate
+
+    def evaluate(self, album: LazyAlbum) -> Optional[AlbumFilter]:
+        """First filter that rejects the album, or None if all pass.
+
+        Raises _AlbumUnavailable if a needed field can't be obtained (counted in `unavailable`).
+        """
+        remaining = list(self.filters)
+        used_page = False
+        try:
+            while remaining:
+                f = min(remaining, key=lambda f: self._rank(f, album))
+                remaining.remove(f)
+                values = [album.get(name) for name in f.fields]
+                used_page = used_page or any(name not in CANDIDATE_FIELDS for name in f.fields)
+                self.evaluated[f.name] += 1
+                if not f.test(*values):
+                    if used_page:
+                        album.check_usable()
+                    self.rejected[f.name] += 1
+                    return f
+            if used_page:
+                album.check_usable()
+        except _AlbumUnavailable as e:
+            self.unavailable[e.reason] += 1
+            raise
+        return None
+
+
+def _details_summary(det: Optional[AlbumDetails]) -> Optional[dict]:
+    """AlbumDetails as the JSON shape used in fixtures/album_pages/expected.json."""
+    if det is None:
+        return None
+    return {
+        "title": det.title,
+        "main_artists": det.main_artists,
+        "total_length": det.total_length_hms,
+        "release_date": det.release_date_album.isoformat() if det.release_date_album else None,
+        "genre_first": det.genre_first,
+        "sources": dict(sorted(det.field_sources.items())),
+    }
+
+
+def compare_structured_fields(paths: Sequence[Path] = ()) -> int:
+    """Parity check: structured-data fields vs text heuristics on saved album pages.
+
+    Without `paths` it runs on the bundled fixtures (FIXTURES_DIR) and also checks
+    parse_album_details() against their expected values. Returns the number of problems:
+    structured != text for a field, details differing from the text-only parse, or
+    details differing from the expected values.
+    """
+    expected: Dict[str, Optional[dict]] = {}
+    if not paths:
+        paths = sorted(FIXTURES_DIR.glob("*.html"))
+        expected = json.loads((FIXTURES_DIR / FIXTURES_EXPECTED).read_text(encoding="utf-8"))
+        for name in sorted(set(expected) - {p.name for p in paths}):
+            console.print(f"[bold red]✖ Brak fixture[/bold red] {name}")
+
+    agree = differ = only_text = only_structured = 0
+    problems = len(set(expected) - {p.name for p in paths})
+    for path in paths:
+        html = path.read_text(encoding="utf-8", errors="replace")
+        found = extract_structured_album_fields(html)
+        soup = BeautifulSoup(html, "html.parser")
+        text_values = {f: ALBUM_TEXT_PARSERS[f](soup) or None for f in ALBUM_FIELDS}
+        for f in STRUCTURED_FIELDS:
+            tv = text_values[f]
+            sv, src = found.get(f, (None, ""))
+            if sv is None and tv is None:
+                continue
+            if sv is None:
+                only_text += 1
+            elif tv is None:
+                only_structured += 1
+            elif sv == tv:
+                agree += 1
+            else:
+                differ += 1
+                console.print(f"[bold yellow]≠[/bold yellow] {path.name} {f}: {src}={sv!r} text={tv!r}")
+
+        # JSON-LD genre is reported only: genre_first always comes from "About the album"
+        album = _find_ld_album(html) if "application/ld+json" in html else None
+        ld_genres = _ld_names(album.get("genre")) if album else []
+        if ld_genres and _first_genre_category(ld_genres[0]) != text_values["genre_first"]:
+            console.print(
+                f"[dim]  {path.name} genre: json-ld={ld_genres[0]!r} text={text_values['genre_first']!r} (nieużywane)[/dim]"
+            )
+
+        det = parse_album_details(html)
+        if det != parse_album_details(html, use_structured=False):
+            problems += 1
+            console.print(f"[bold red]✖[/bold red] {path.name}: szczegóły albumu różne od parsowania samego tekstu")
+        if path.name in expected and _details_summary(det) != expected[path.name]:
+            problems += 1
+            console.print(
+                f"[bold red]✖[/bold red] {path.name}: oczekiwano {expected[path.name]!r}, jest {_details_summary(det)!r}"
+            )
+
+    problems += differ
+    console.print(f"[bold]Structured vs text[/bold] ({len(paths)} stron):")
+    console.print(f"• zgodne: [bold]{agree}[/bold], różne: [bold]{differ}[/bold]")
+    console.print(f"• tylko tekst: [bold]{only_text}[/bold], tylko structured: [bold]{only_structured}[/bold]")
+    if expected:
+        console.print(f"• fixtures ({FIXTURES_EXPECTED}): [bold]{'OK' if not problems else f'{problems} problemów'}[/bold]")
+    return problems
+
+
+def scan_label_listings(
+    session: requests.Session,
+    src: LabelSource,
+    start: date,
+    end: date,
+    delay_list: float,
+    stats: Optional[FetchStats] = None,
+    profiler: Optional[NullProfiler] = None,
+    observed: Optional[List[Tuple[str, date]]] = None,
+    max_requests: Optional[int] = None,
+    backoff_scale: float = 1.0,
+) -> List[Candidate]:
+    """Listing pages of one label (page 1, and page 2 if linked) -> candidates within [start, end].
+
+    All dated tiles seen on the listing (in range or not) are appended to `observed`, if given.
+    Page 2 is skipped once `stats.requests` reaches `max_requests` (run --budget).
+    """
+    profiler = profiler or NullProfiler()
+    base_url = normalize_label_base(src.url)
+    out: List[Candidate] = []
+
+    # Page 1
+    page1_url = build_label_page_url(base_url, 1)
+    with profiler.stage(STAGE_LISTING_FETCH):
+        html1 = fetch_html(session, page1_url, stats, backoff_scale)
+
+    has2 = False
+    if html1:
+        with profiler.stage(STAGE_LISTING_PARSE):
+            soup1 = BeautifulSoup(html1, "html.parser")
+            del html1
+            out.extend(extract_album_candidates_from_soup(soup1, page1_url, src.name, start, end, observed))
+            has2 = listing_has_page2(soup1, base_url)
+
+    polite_sleep(delay_list)
+
+    # Page 2
+    over_budget = max_requests is not None and stats is not None and stats.requests >= max_requests
+    if has2 and MAX_PAGES_PER_LABEL >= 2 and not over_budget:
+        page2_url = build_label_page_url(base_url, 2)
+        with profiler.stage(STAGE_LISTING_FETCH):
+            html2 = fetch_html(session, page2_url, stats, backoff_scale)
+
+        if html2:
+            with profiler.stage(STAGE_LISTING_PARSE):
+                soup2 = BeautifulSoup(html2, "html.parser")
+                del html2
+                out.extend(extract_album_candidates_from_soup(soup2, page2_url, src.name, start, end, observed))
+
+        polite_sleep(delay_list)
+
+    return out
+
+
+@dataclass
+class LabelCadence:
+    """What past runs have seen on a label's listing (persisted in label_cadence.json)."""
+
+    known: Dict[str, str] = field(default_factory=dict)  # album_url -> release date (ISO)
+    evaluated: set = field(default_factory=set)  # known album URLs whose page got a verdict (not over_budget)
+    last_scan: Optional[str] = None  # ISO date
+    listing_pages: float = float(MAX_PAGES_PER_LABEL)  # average listing pages fetched per scan
+
+
+def cadence_key(src: LabelSource) -> str:
+    return normalize_label_base(src.url)
+
+
+def load_cadence(path: Path) -> Dict[str, LabelCadence]:
+    if not path.exists():
+        return {}
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+    except ValueError:
+        console.print(f"[bold yellow]⚠️ Nieczytelny {path.name}[/bold yellow] — zaczynam naukę od nowa")
+        return {}
+    return {
+        key: LabelCadence(
+            known=dict(v.get("known", {})),
+            evaluated=set(v.get("evaluated", [])),
+            last_scan=v.get("last_scan"),
+            listing_pages=float(v.get("listing_pages", MAX_PAGES_PER_LABEL)),
+        )
+        for key, v in raw.items()
+    }
+
+
+def save_cadence(path: Path, cadence: Dict[str, LabelCadence]) -> None:
+    data = {
+        key: {
+            "known": c.known,
+            "evaluated": sorted(u for u in c.evaluated if u in c.known),
+            "last_scan": c.last_scan,
+            "listing_pages": round(c.listing_pages, 2),
+        }
+        for key, c in sorted(cadence.items())
+    }
+    _replace_atomically(path, lambda f: json.dump(data, f, ensure_ascii=False, indent=1))
+
+
+def releases_per_day(c: LabelCadence, today: date) -> Optional[float]:
+    """Release rate from known listing dates, counting the silence up to today; None if too little history."""
+    dates = [date.fromisoformat(d) for d in c.known.values()]
+    if len(dates) < CADENCE_MIN_KNOWN:
+        return None
+    span = max(CADENCE_MIN_SPAN_DAYS, (today - min(dates)).days)
+    return len(dates) / span
 
-    release_date_album = parse_album_release_date(soup)
-    genre_first = parse_album_first_genre(soup)
 
-    if not title and not main_artists:
+def expected_new_releases(c: Optional[LabelCadence], today: date) -> Optional[float]:
+    """Releases expected to have appeared since the last scan; None for labels without a usable history."""
+    if c is None or c.last_scan is None:
+        return None
+    rate = releases_per_day(c, today)
+    if rate is None:
         return None
+    days = max(0, (today - date.fromisoformat(c.last_scan)).days)
+    return rate * days
+
+
+def update_cadence(
+    c: LabelCadence,
+    observed: List[Tuple[str, date]],
+    listing_pages: int,
+    today: date,
+) -> int:
+    """Merge one scan's observations; returns how many listing albums were not known before."""
+    new = 0
+    for album_url, rel in observed:
+        if album_url not in c.known:
+            new += 1
+        c.known[album_url] = rel.isoformat()
+    if len(c.known) > CADENCE_MAX_KNOWN:
+        newest = sorted(c.known.items(), key=lambda kv: kv[1], reverse=True)[:CADENCE_MAX_KNOWN]
+        c.known = dict(newest)
+        c.evaluated &= c.known.keys()
+    if listing_pages:
+        c.listing_pages = 0.7 * c.listing_pages + 0.3 * listing_pages
+    c.last_scan = today.isoformat()
+    return new
+
+
+def plan_label_scan(
+    labels: List[LabelSource],
+    cadence: Dict[str, LabelCadence],
+    budget: int,
+    today: date,
+    start: date,
+    end: date,
+) -> List[LabelSource]:
+    """Pick labels to scan this run within a request budget.
+
+    Labels without a usable history, and labels not scanned for CADENCE_MAX_DAYS
+    days, go first; the rest are ranked by albums to evaluate per request:
+    expected new releases plus known albums dated within [start, end] whose page
+    has not been evaluated yet (e.g. skipped as over_budget). A label's cost is
+    its listing pages plus one album page per such album; albums evaluated on
+    earlier runs are fetched last (main()), so they are not charged. A quiet
+    label's expectation grows with time since its last scan, so it is picked up
+    again eventually. Ties go to the label scanned least recently. The result
+    keeps the order of the labels file. main() also stops fetching once the
+    budget is spent, since these costs are only estimates.
+    """
+    ranked = []
+    lo, hi = start.isoformat(), end.isoformat()
+    for i, src in enumerate(labels):
+        c = cadence.get(cadence_key(src))
+        exp = expected_new_releases(c, today)
+        pages = c.listing_pages if c else float(MAX_PAGES_PER_LABEL)
+        pending = (
+            sum(1 for url, d in c.known.items() if lo <= d <= hi and url not in c.evaluated) if c else 0
+        )
+        value = pending + (exp or 0.0)
+        cost = pages + value
+        stale = (
+            exp is None
+            or c.last_scan is None
+            or (today - date.fromisoformat(c.last_scan)).days >= CADENCE_MAX_DAYS
+        )
+        last_scan = c.last_scan if c and c.last_scan else ""
+        ranked.append((0 if stale else 1, -value / cost, last_scan, i, cost))
 
-    return AlbumDetails(
-        title=title,
-        main_artists=main_artists,
-        total_length_hms=total_hms,
-        total_seconds=total_seconds,
-        release_date_album=release_date_album,
-        genre_first=genre_first,
+    chosen = []
+    spent = 0.0
+    for _, _, _, i, cost in sorted(ranked):
+        if spent + cost > budget and chosen:
+            continue
+        chosen.append(i)
+        spent += cost
+    return [labels[i] for i in sorted(chosen)]
+
+
+def make_output_record(cand: Candidate, det: AlbumDetails, release_date: date) -> OutputRecord:
+    return OutputRecord(
+        album_title=det.title,
+        main_artists=det.main_artists,
+        label=cand.label_name,
+        album_url=cand.album_url,
+        release_date=release_date,
     )
 
 
-def write_links_txt(path: Path, links: List[str]) -> None:
-    path.write_text("\n".join(links) + ("\n" if links else ""), encoding="utf-8")
+def record_key(r: OutputRecord) -> Tuple[str, str, str]:
+    """Dedup key: (title, artists) within the same label."""
+    return (norm_key(r.album_title), norm_key(r.main_artists), norm_key(r.label))
+
+
+def iter_deduped(records: Iterable[OutputRecord]) -> Iterator[OutputRecord]:
+    """Drop repeated record_key()s, keeping the first occurrence.
+
+    Keys are kept as 16-byte digests so the seen-set stays small for millions of records.
+    """
+    seen = set()
+    for r in records:
+        digest = hashlib.blake2b("\x1f".join(record_key(r)).encode("utf-8"), digest_size=16).digest()
+        if digest in seen:
+            continue
+        seen.add(digest)
+        yield r
+
+
+def record_to_json(r: OutputRecord) -> str:
+    return json.dumps(
+        {
+            "album_title": r.album_title,
+            "main_artists": r.main_artists,
+            "label": r.label,
+            "album_url": r.album_url,
+            "release_date": r.release_date.isoformat(),
+        },
+        ensure_ascii=False,
+    )
+
+
+def record_from_json(line: str) -> OutputRecord:
+    d = json.loads(line)
+    return OutputRecord(
+        album_title=d["album_title"],
+        main_artists=d["main_artists"],
+        label=d["label"],
+        album_url=d["album_url"],
+        release_date=date.fromisoformat(d["release_date"]),
+    )
+
+
+def _replace_atomically(path: Path, write) -> None:
+    """Write via a temp file + os.replace, so readers tailing `path` never see a partial file."""
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def write_records_jsonl(path: Path, records: Iterable[OutputRecord]) -> int:
+    n = 0
+
+    def write(f) -> None:
+        nonlocal n
+        for r in records:
+            f.write(record_to_json(r) + "\n")
+            n += 1
+
+    _replace_atomically(path, write)
+    return n
+
+
+def iter_records_jsonl(paths: Iterable[Path]) -> Iterator[OutputRecord]:
+    for path in paths:
+        with path.open("r", encoding="utf-8") as f:
+            for i, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield record_from_json(line)
+                except (ValueError, KeyError) as e:
+                    console.print(f"[bold yellow]⚠️ Pomijam {path.name}:{i}[/bold yellow] ({e})")
+
+
+def parse_shard(s: str) -> Tuple[int, int]:
+    """"i/N" (1-based) -> (i, N)."""
+    i, sep, n = s.partition("/")
+    try:
+        index, count = int(i), int(n)
+    except ValueError:
+        index = count = 0
+    if not sep or count < 1 or not (1 <= index <= count):
+        raise argparse.ArgumentTypeError(f"niepoprawny shard {s!r} (oczekiwano i/N, np. 1/4)")
+    return index, count
+
+
+def parse_budget(s: str) -> int:
+    """run --budget N: a positive request count."""
+    try:
+        n = int(s)
+    except ValueError:
+        n = 0
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"niepoprawny budżet {s!r} (oczekiwano liczby zapytań >= 1)")
+    return n
+
+
+def label_shard(src: LabelSource, count: int) -> int:
+    """Stable 1-based shard for a label (same on every machine and Python run)."""
+    key = normalize_label_base(src.url).strip().casefold().encode("utf-8")
+    return int.from_bytes(hashlib.sha1(key).digest()[:8], "big") % count + 1
+
+
+def shard_output_name(index: int, count: int) -> str:
+    return OUT_SHARD_TEMPLATE.format(index=index, count=count)
+
+
+def write_links_txt(path: Path, links: Iterable[str]) -> None:
+    def write(f) -> None:
+        for link in links:
+            f.write(link + "\n")
+
+    _replace_atomically(path, write)
+
+
+def _cut_torn_tail(path: Path, max_line: int = 64 * 1024) -> None:
+    """Drop a last line without a newline (write interrupted by a crash) so appends start on a fresh line."""
+    if not path.exists():
+        return
+    with path.open("rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(max(0, size - max_line))
+        tail = f.read()
+        if tail.endswith(b"\n"):
+            return
+        keep = size - len(tail) + tail.rfind(b"\n") + 1
+        f.truncate(keep)
+    console.print(f"[bold yellow]⚠️ {path.name}:[/bold yellow] obcięto niedokończoną ostatnią linię ({size - keep} B)")
+
+
+class RecordSink:
+    """Appends accepted records to the output files while the scrape is running.
+
+    Records are deduplicated on the fly with the same key as the final pass, so a
+    consumer tailing the files sees each album once, in final order. Files are
+    flushed per record and fsync'ed every `fsync_every` records / `fsync_interval`
+    seconds; the final pass then replaces them with the canonical versions.
+
+    With `append=True` (watch mode) existing files are kept: records already in the
+    JSONL count as seen, and a line torn by a crash is cut off before appending.
+    """
+
+    def __init__(
+        self,
+        jsonl_path: Path,
+        links_path: Optional[Path] = None,
+        fsync_every: int = SINK_FSYNC_EVERY,
+        fsync_interval: float = SINK_FSYNC_INTERVAL,
+        append: bool = False,
+    ) -> None:
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._seen = set()
+        if append:
+            for path in (jsonl_path, links_path):
+                if path:
+                    _cut_torn_tail(path)
+            if jsonl_path.exists():
+                self._seen = {record_key(r) for r in iter_records_jsonl([jsonl_path])}
+        mode = "a" if append else "w"
+        self._files = [jsonl_path.open(mode, encoding="utf-8")]
+        self._links = links_path.open(mode, encoding="utf-8") if links_path else None
+        if self._links:
+            self._files.append(self._links)
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self.written = 0
+
+    def add(self, r: OutputRecord) -> bool:
+        """Append a record; returns False (and writes nothing) for a duplicate."""
+        key = record_key(r)
+        if key in self._seen:
+            return False
+        self._seen.add(key)
+
+        self._files[0].write(record_to_json(r) + "\n")
+        if self._links:
+            self._links.write(r.album_url + "\n")
+        for f in self._files:
+            f.flush()
+        self.written += 1
+
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+        return True
+
+    def sync(self) -> None:
+        for f in self._files:
+            os.fsync(f.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        if not self._files:
+            return
+        self.sync()
+        for f in self._files:
+            f.close()
+        self._files = []
 
 
 
@@ -656,6 +1881,335 @@ def write_xlsx(path: Path, records: List[OutputRecord]) -> None:
     wb.save(path)
 
 
+def write_xlsx_stream(path: Path, records: Iterable[OutputRecord]) -> int:
+    """Same layout as write_xlsx, but write-only (rows are not kept in memory).
+
+    Continues on a new sheet ("albums_2", ...) when a sheet reaches Excel's row limit.
+    """
+    wb = Workbook(write_only=True)
+    headers = ["album_title", "main_artists", "label", "album_url", "release_date"]
+    widths = [40, 45, 28, 65, 14]
+    header_font = Font(bold=True)
+    header_align = Alignment(vertical="center", horizontal="left", wrap_text=True)
+    cell_align = Alignment(vertical="top", horizontal="left", wrap_text=True)
+
+    def new_sheet(n: int):
+        ws = wb.create_sheet("albums" if n == 1 else f"albums_{n}")
+        ws.freeze_panes = "A2"
+        for i, w in enumerate(widths, start=1):
+            ws.column_dimensions[get_column_letter(i)].width = w
+        row = []
+        for h in headers:
+            c = WriteOnlyCell(ws, value=h)
+            c.font = header_font
+            c.alignment = header_align
+            row.append(c)
+        ws.append(row)
+        return ws
+
+    sheets = 1
+    ws = new_sheet(sheets)
+    rows_in_sheet = 1
+    total = 0
+    for r in records:
+        if rows_in_sheet >= XLSX_MAX_ROWS:
+            sheets += 1
+            ws = new_sheet(sheets)
+            rows_in_sheet = 1
+        row = []
+        for v in (r.album_title, r.main_artists, r.label, r.album_url, r.release_date.strftime("%d.%m.%Y")):
+            c = WriteOnlyCell(ws, value=v)
+            c.alignment = cell_align
+            row.append(c)
+        ws.append(row)
+        rows_in_sheet += 1
+        total += 1
+
+    wb.save(path)
+    return total
+
+
+def merge_shards(paths: List[Path], out_dir: Path) -> None:
+    """Combine shard JSONL files into the final, deduplicated list_links.txt and XLSX.
+
+    Streams records twice (links, then XLSX) so memory stays bounded by the dedup set.
+    """
+    # natural order: shard_2of12 before shard_10of12
+    paths = sorted(paths, key=lambda p: [int(t) if t.isdigit() else t for t in re.split(r"(\d+)", p.name)])
+    missing = [p for p in paths if not p.exists()]
+    if missing:
+        console.print(f"[bold red]Brak pliku:[/bold red] {', '.join(p.name for p in missing)}")
+        sys.exit(1)
+
+    out_links_path = out_dir / OUT_LINKS
+    out_xlsx_path = out_dir / OUT_XLSX
+
+    total = sum(1 for _ in iter_records_jsonl(paths))
+    n_links = 0
+
+    def links():
+        nonlocal n_links
+        for r in iter_deduped(iter_records_jsonl(paths)):
+            n_links += 1
+            yield r.album_url
+
+    write_links_txt(out_links_path, links())
+    n_rows = write_xlsx_stream(out_xlsx_path, iter_deduped(iter_records_jsonl(paths)))
+
+    console.print("[bold green]💾 Zapisano pliki:[/bold green]")
+    console.print(f"• {OUT_LINKS}  ([dim]{n_links} linków po deduplikacji[/dim])")
+    console.print(f"• {OUT_XLSX}  ([dim]{n_rows} wierszy po deduplikacji[/dim])\n")
+    console.print("[bold]Podsumowanie:[/bold]")
+    console.print(f"• Pliki shardów: [bold]{len(paths)}[/bold], rekordy: [bold]{total}[/bold]")
+    if total != n_rows:
+        console.print(f"• Usunięte duplikaty: [bold]{total - n_rows}[/bold]")
+
+
+def _dataset_schema():
+    return pa.schema(
+        [
+            ("album_url", pa.string()),
+            ("label", pa.string()),
+            ("release_date_listing", pa.date32()),
+            ("release_date_album", pa.date32()),
+            ("title", pa.string()),
+            ("main_artists", pa.string()),
+            ("total_length_hms", pa.string()),
+            ("total_seconds", pa.int32()),
+            ("genre_first", pa.string()),
+            ("field_sources", pa.string()),
+            ("accepted", pa.bool_()),
+            ("rejection_reason", pa.string()),
+            ("fetch_seconds", pa.float64()),
+            ("parse_seconds", pa.float64()),
+            ("scraped_at", pa.timestamp("s")),
+        ]
+    )
+
+
+class AlbumDatasetWriter:
+    """One row per processed album, for analysis across runs.
+
+    Files go to <root>/run_date=YYYY-MM-DD/part-HHMMSS-<pid>.parquet (Hive-style
+    partitioning, readable with pyarrow.dataset / pandas / DuckDB). Without pyarrow
+    the same columns are written as .csv. Rows are flushed in batches of
+    DATASET_BATCH_ROWS, so memory does not grow with the run.
+    """
+
+    def __init__(self, root: Path, run_started: Optional[datetime] = None) -> None:
+        run_started = run_started or datetime.now()
+        self.format = "parquet" if pa is not None else "csv"
+        part_dir = root / f"run_date={run_started.date().isoformat()}"
+        part_dir.mkdir(parents=True, exist_ok=True)
+        self.path = part_dir / f"part-{run_started.strftime('%H%M%S')}-{os.getpid()}.{self.format}"
+        self.rows = 0
+        self._batch: List[dict] = []
+        self._parquet = None
+        self._csv_file = None
+        self._csv = None
+        if pa is None:
+            self._csv_file = self.path.open("w", encoding="utf-8", newline="")
+            self._csv = csv.DictWriter(self._csv_file, fieldnames=DATASET_COLUMNS)
+            self._csv.writeheader()
+        else:
+            self._parquet = pq.ParquetWriter(self.path, _dataset_schema())
+
+    def add(
+        self,
+        cand: Candidate,
+        fields: Dict[str, Tuple[object, str]],
+        rejection_reason: Optional[str],
+        fetch_seconds: float,
+        parse_seconds: float,
+    ) -> None:
+        """One row; `fields` is LazyAlbum.snapshot(): album fields not extracted before the verdict stay empty."""
+        value = {name: v for name, (v, _) in fields.items()}
+        total = value.get("total_length") or (None, None)
+        self._batch.append(
+            {
+                "album_url": cand.album_url,
+                "label": cand.label_name,
+                "release_date_listing": cand.release_date_listing,
+                "release_date_album": value.get("release_date"),
+                "title": value.get("title") or None,
+                "main_artists": value.get("main_artists") or None,
+                "total_length_hms": total[0],
+                "total_seconds": total[1],
+                "genre_first": value.get("genre_first"),
+                "field_sources": json.dumps({n: src for n, (_, src) in fields.items()}, sort_keys=True) if fields else None,
+                "accepted": rejection_reason is None,
+                "rejection_reason": rejection_reason,
+                "fetch_seconds": round(fetch_seconds, 4),
+                "parse_seconds": round(parse_seconds, 4),
+                "scraped_at": datetime.now().replace(microsecond=0),
+            }
+        )
+        self.rows += 1
+        if len(self._batch) >= DATASET_BATCH_ROWS:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._batch:
+            return
+        if self._parquet is not None:
+            self._parquet.write_table(pa.Table.from_pylist(self._batch, schema=self._parquet.schema))
+        else:
+            self._csv.writerows(self._batch)
+            self._csv_file.flush()
+        self._batch = []
+
+    def close(self) -> None:
+        self.flush()
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+        if self._csv_file is not None:
+            self._csv_file.close()
+            self._csv_file = None
+
+
+class NullProfiler:
+    """Stand-in when --profile is off: stage() is a shared no-op context manager."""
+
+    _NULL_STAGE = nullcontext()
+
+    def stage(self, name: str):
+        return self._NULL_STAGE
+
+    def close(self) -> None:
+        pass
+
+
+class StageProfiler:
+    """Per-stage CPU and allocation profiles (run --profile DIR).
+
+    For every stage name it writes to DIR:
+      - <stage>.pstats      cProfile stats (open with pstats / snakeviz)
+      - <stage>.alloc.txt   top allocation sites of the stage: tracemalloc snapshots
+                            taken when a call starts and ends, diffed and summed over
+                            the sampled calls (one per PROFILE_SNAPSHOT_INTERVAL)
+    plus stacks.collapsed: stacks of the main thread sampled every
+    PROFILE_SAMPLE_INTERVAL seconds, rooted at the stage name, in the
+    "frame;frame;frame count" format used by flamegraph.pl / speedscope.
+
+    Stages do not nest: a stage entered while another is active is counted in the outer one.
+    """
+
+    def __init__(self, out_dir: Path, sample_interval: float = PROFILE_SAMPLE_INTERVAL) -> None:
+        self.out_dir = out_dir
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.sample_interval = sample_interval
+        self._profiles: Dict[str, cProfile.Profile] = {}
+        self._calls: Dict[str, int] = {}
+        self._wall: Dict[str, float] = {}
+        self._peak: Dict[str, int] = {}
+        self._alloc: Dict[str, Dict[tracemalloc.Traceback, List[int]]] = {}  # traceback -> [bytes, blocks]
+        self._alloc_calls: Dict[str, int] = {}
+        self._last_snapshot: Dict[str, float] = {}
+        self._stacks: Counter = Counter()
+        self._current: Optional[str] = None
+
+        # allocation diffs leave out tracemalloc itself and the sampler thread's own bookkeeping
+        sampler = StageProfiler._sample_loop.__code__
+        self._trace_filters = [tracemalloc.Filter(False, tracemalloc.__file__)] + [
+            tracemalloc.Filter(False, sampler.co_filename, line)
+            for line in sorted({line for _, _, line in sampler.co_lines() if line})
+        ]
+        tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+        self._main_ident = threading.get_ident()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_loop, name="stage-sampler", daemon=True)
+        self._sampler.start()
+
+    @contextmanager
+    def stage(self, name: str):
+        if self._current is not None:
+            yield
+            return
+
+        prof = self._profiles.setdefault(name, cProfile.Profile())
+        before = None
+        now = time.monotonic()
+        if now - self._last_snapshot.get(name, float("-inf")) >= PROFILE_SNAPSHOT_INTERVAL:
+            before = self._snapshot()
+            self._last_snapshot[name] = now
+        self._current = name
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            self._wall[name] = self._wall.get(name, 0.0) + time.perf_counter() - t0
+            self._calls[name] = self._calls.get(name, 0) + 1
+            self._peak[name] = max(self._peak.get(name, 0), tracemalloc.get_traced_memory()[1] - base)
+            self._current = None
+            if before is not None:
+                self._add_alloc_diff(name, self._snapshot().compare_to(before, "lineno"))
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(self._trace_filters)
+
+    def _add_alloc_diff(self, name: str, diffs: List[tracemalloc.StatisticDiff]) -> None:
+        """Accumulate what one stage call allocated (and still held at its end), per source line."""
+        totals = self._alloc.setdefault(name, {})
+        for d in diffs:
+            if d.size_diff or d.count_diff:
+                t = totals.setdefault(d.traceback, [0, 0])
+                t[0] += d.size_diff
+                t[1] += d.count_diff
+        self._alloc_calls[name] = self._alloc_calls.get(name, 0) + 1
+
+    def _sample_loop(self) -> None:
+        while not self._stop.wait(self.sample_interval):
+            stage = self._current
+            frame = sys._current_frames().get(self._main_ident)
+            if stage is None or frame is None:
+                continue
+            # keep code objects only: formatting here would show up in the stage's allocations
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            self._stacks[(stage, tuple(codes))] += 1
+
+    def summary(self) -> List[Tuple[str, int, float, int]]:
+        """(stage, calls, wall seconds, peak allocated bytes), slowest first."""
+        return sorted(
+            ((n, self._calls[n], self._wall[n], self._peak[n]) for n in self._wall),
+            key=lambda row: row[2],
+            reverse=True,
+        )
+
+    def close(self) -> None:
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._sampler.join()
+
+        for name, prof in self._profiles.items():
+            prof.dump_stats(str(self.out_dir / f"{name}.pstats"))
+
+        for name, totals in self._alloc.items():
+            top = sorted(totals.items(), key=lambda kv: kv[1][0], reverse=True)[:PROFILE_ALLOC_TOP]
+            with (self.out_dir / f"{name}.alloc.txt").open("w", encoding="utf-8") as f:
+                f.write(f"# peak allocated during one '{name}' call: {self._peak.get(name, 0)} B\n")
+                f.write(
+                    f"# net allocations per line (end - start snapshot), summed over "
+                    f"{self._alloc_calls[name]} of {self._calls.get(name, 0)} calls\n"
+                )
+                for tb, (size, count) in top:
+                    f.write(f"{tb[0]}: size={size / 1024:+.1f} KiB, count={count:+d}\n")
+        tracemalloc.stop()
+
+        with (self.out_dir / "stacks.collapsed").open("w", encoding="utf-8") as f:
+            for (stage, codes), count in self._stacks.most_common():
+                names = [f"{c.co_name} ({os.path.basename(c.co_filename)}:{c.co_firstlineno})" for c in reversed(codes)]
+                f.write(";".join([stage] + names) + f" {count}\n")
+
+
 def ask_float(prompt: str, default: float) -> float:
     while True:
         raw = Prompt.ask(prompt, default=str(default)).strip().replace(",", ".")
@@ -669,19 +2223,7 @@ def ask_float(prompt: str, default: float) -> float:
             console.print("[bold red]Podaj liczbę (np. 0.35).[/bold red]")
 
 
-def main() -> None:
-    console.print("[bold magenta]Qobuz multi-label scraper[/bold magenta]")
-    console.print(
-        "[dim]Filtr: data (listing + weryfikacja na album page) + minimalny czas (album page) + gatunek (pierwszy = Classical). Deduplikacja na końcu.[/dim]\n"
-    )
-
-    script_dir = Path(__file__).resolve().parent
-    labels_path = script_dir / LABELS_FILE
-    labels = read_labels_file(labels_path)
-    if not labels:
-        sys.exit(1)
-
-    # User inputs
+def ask_run_settings() -> RunSettings:
     while True:
         try:
             start_s = Prompt.ask("[bold]Zakres dat OD[/bold] (DD.MM.RRRR)").strip()
@@ -703,220 +2245,687 @@ def main() -> None:
     delay_list = ask_float("Opóźnienie między stronami listy (sek.)", default=0.35)
     delay_album = ask_float("Opóźnienie między stronami albumów (sek.)", default=0.55)
 
+    return RunSettings(
+        start_date=start_date,
+        end_date=end_date,
+        min_minutes=min_minutes,
+        delay_list=delay_list,
+        delay_album=delay_album,
+    )
+
+
+def main(
+    shard: Optional[Tuple[int, int]] = None,
+    dataset_dir: Optional[Path] = None,
+    profile_dir: Optional[Path] = None,
+    scan_budget: Optional[int] = None,
+    extra_filters: Sequence[AlbumFilter] = (),
+    settings: Optional[RunSettings] = None,
+    work_dir: Optional[Path] = None,
+) -> RunSummary:
+    """Full scrape. Without `settings` the date range, minimum length and delays are asked interactively;
+    `work_dir` (default: script folder) holds the labels file and all outputs."""
+    console.print("[bold magenta]Qobuz multi-label scraper[/bold magenta]")
+    console.print(
+        "[dim]Filtr: data (listing + weryfikacja na album page) + minimalny czas (album page) + gatunek (pierwszy = Classical). Deduplikacja na końcu.[/dim]\n"
+    )
+
+    script_dir = work_dir or Path(__file__).resolve().parent
+    labels_path = script_dir / LABELS_FILE
+    labels = read_labels_file(labels_path)
+    if not labels:
+        sys.exit(1)
+
+    labels_in_file = len(labels)
+    if shard:
+        shard_index, shard_count = shard
+        labels = [src for src in labels if label_shard(src, shard_count) == shard_index]
+        console.print(
+            f"[bold]Shard {shard_index}/{shard_count}:[/bold] {len(labels)} z {labels_in_file} labeli "
+            f"→ {shard_output_name(shard_index, shard_count)}\n"
+        )
+
+    settings = settings or ask_run_settings()
+    start_date, end_date = settings.start_date, settings.end_date
+    min_minutes = settings.min_minutes
+    delay_list, delay_album = settings.delay_list, settings.delay_album
+
     console.print("\n[bold]Ustawienia:[/bold]")
     console.print(f"• Labels: [bold]{len(labels)}[/bold] (z {LABELS_FILE})")
     console.print(
         f"• Data: [bold]{start_date.strftime('%d.%m.%Y')}[/bold] → [bold]{end_date.strftime('%d.%m.%Y')}[/bold] (włącznie)"
     )
-    console.print(f"• Minimalna długość: [bold]{min_minutes}[/bold] min (odrzuca krótsze)")
+    # --filter genre/length replaces the default one, so list what will actually run
+    album_filters = default_album_filters(date_window_filter(start_date, end_date), min_minutes, extra_filters)
+    console.print(f"• Filtry albumów: [bold]{'; '.join(f.name for f in album_filters)}[/bold]")
     console.print(f"• Max stron na label: [bold]{MAX_PAGES_PER_LABEL}[/bold]")
     console.print(f"• Delay list: [bold]{delay_list}[/bold]s, Delay album: [bold]{delay_album}[/bold]s\n")
 
-    session = make_session()
+    # Release cadence learned from previous runs; with a budget, only the most promising labels are scanned
+    today = date.today()
+    cadence_path = script_dir / CADENCE_FILE
+    cadence = load_cadence(cadence_path)
+    labels_to_scan = (
+        plan_label_scan(labels, cadence, scan_budget, today, start_date, end_date) if scan_budget else labels
+    )
+    if scan_budget:
+        console.print(
+            f"• Budżet zapytań: [bold]{scan_budget}[/bold] → skanuję [bold]{len(labels_to_scan)}[/bold] "
+            f"z {len(labels)} labeli (wg kadencji wydań)\n"
+        )
+    expected_new = 0.0
+    actual_new = 0  # on labels with an estimate
+    first_scan_new = 0  # on labels scanned without an estimate
+    evaluated_before: set = set()  # album URLs whose page got a verdict in earlier runs
+    labels_scanned = 0
 
-    # Phase 1: scan listing pages (up to 2 per label)
-    candidates: List[Candidate] = []
-    seen_album_per_label = set()  # (album_url, label_name)
+    session = make_session()
+    fetch_stats = FetchStats()
+    profiler = StageProfiler(profile_dir) if profile_dir else NullProfiler()
+    try:
+        # Phase 1: scan listing pages (up to 2 per label)
+        candidates: List[Candidate] = []
+        seen_album_per_label: Dict[Tuple[str, str], LabelCadence] = {}  # (album_url, label_name) -> its label
 
-    total_steps_est = len(labels) * MAX_PAGES_PER_LABEL
+        total_steps_est = len(labels_to_scan) * MAX_PAGES_PER_LABEL
 
-    scan_progress = Progress(
-        SpinnerColumn(),
-        TextColumn("[bold cyan]Skanuję listingi label[/bold cyan]"),
-        BarColumn(),
-        TextColumn("{task.completed}/{task.total}"),
-        TimeElapsedColumn(),
-        console=console,
-    )
+        scan_progress = Progress(
+            SpinnerColumn(),
+            TextColumn("[bold cyan]Skanuję listingi label[/bold cyan]"),
+            BarColumn(),
+            TextColumn("{task.completed}/{task.total}"),
+            TimeElapsedColumn(),
+            console=console,
+        )
 
-    # Phase 2: collect accepted records
-    accepted_records: List[OutputRecord] = []
-    mismatch_date = 0
-    missing_album_date = 0
-    rejected_by_genre = 0
-    missing_album_date_rows: List[str] = []
-    rejected_by_genre_rows: List[Tuple[str, str, str, str, str, str]] = []
+        # Phase 2: collect accepted records
+        accepted_records: List[OutputRecord] = []
+        engine = FilterEngine(album_filters)
+        missing_album_date_rows: List[str] = []
+        rejected_by_genre_rows: List[Tuple[str, str, str, str, str, str]] = []
 
-    try:
-        with scan_progress:
-            task_id = scan_progress.add_task("scan", total=total_steps_est)
+        # Optional per-album dataset (Parquet, or CSV without pyarrow)
+        dataset = AlbumDatasetWriter(dataset_dir) if dataset_dir else None
 
-            for src in labels:
-                base_url = normalize_label_base(src.url)
+        # Live outputs: appended as albums are accepted (a shard streams only its JSONL)
+        if shard:
+            sink = RecordSink(script_dir / shard_output_name(*shard))
+        else:
+            sink = RecordSink(script_dir / OUT_RECORD_LOG, links_path=script_dir / OUT_LINKS)
 
-                # Page 1
-                page1_url = build_label_page_url(base_url, 1)
-                html1 = fetch_html(session, page1_url)
-                scan_progress.advance(task_id)
+        try:
+            with scan_progress:
+                task_id = scan_progress.add_task("scan", total=total_steps_est)
 
-                has2 = False
-                if html1:
-                    found = extract_album_candidates_from_listing(html1, page1_url, src.name, start_date, end_date)
+                for src in labels_to_scan:
+                    if scan_budget and fetch_stats.requests >= scan_budget:
+                        scan_progress.advance(task_id, MAX_PAGES_PER_LABEL)
+                        continue
+                    labels_scanned += 1
+                    observed: List[Tuple[str, date]] = []
+                    pages_before = fetch_stats.pages
+                    found = scan_label_listings(
+                        session, src, start_date, end_date, delay_list, fetch_stats, profiler, observed, scan_budget,
+                        backoff_scale=settings.backoff_scale,
+                    )
+                    label_cadence = cadence.setdefault(cadence_key(src), LabelCadence())
                     for c in found:
                         key = (c.album_url, c.label_name)
                         if key not in seen_album_per_label:
-                            seen_album_per_label.add(key)
+                            seen_album_per_label[key] = label_cadence
                             candidates.append(c)
 
-                    soup1 = BeautifulSoup(html1, "html.parser")
-                    has2 = listing_has_page2(soup1, base_url)
-
-                polite_sleep(delay_list)
+                    evaluated_before.update(label_cadence.evaluated)
+                    exp = expected_new_releases(label_cadence, today)
+                    new = update_cadence(label_cadence, observed, fetch_stats.pages - pages_before, today)
+                    if exp is None:
+                        first_scan_new += new
+                    else:
+                        expected_new += exp
+                        actual_new += new
+                    # progress counts MAX_PAGES_PER_LABEL steps per label, whether or not page 2 exists
+                    scan_progress.advance(task_id, MAX_PAGES_PER_LABEL)
+
+            console.print(f"[bold green]✓[/bold green] Kandydaci po dacie z listingu: [bold]{len(candidates)}[/bold]\n")
+
+            def fetch_album(url: str) -> Optional[str]:
+                if scan_budget and fetch_stats.requests >= scan_budget:
+                    raise _AlbumUnavailable(REJECT_OVER_BUDGET)
+                return fetch_html(session, url, fetch_stats, settings.backoff_scale)
+
+            if scan_budget:
+                # what the budget is for: albums never evaluated before are fetched first,
+                # taking turns between labels so no single label uses up the budget
+                turn: Counter = Counter()
+                order = {}
+                for c in candidates:
+                    done = c.album_url in evaluated_before
+                    order[c] = (done, turn[(c.label_name, done)])
+                    turn[(c.label_name, done)] += 1
+                candidates.sort(key=order.__getitem__)
+
+            # Phase 2: fetch details and filter by minimum length (AND re-check date from album page)
+            details_progress = Progress(
+                SpinnerColumn(),
+                TextColumn("[bold cyan]Pobieram strony albumów[/bold cyan]"),
+                BarColumn(),
+                TextColumn("{task.completed}/{task.total}"),
+                TimeElapsedColumn(),
+                TimeRemainingColumn(),
+                console=console,
+            )
 
-                # Page 2
-                if has2 and MAX_PAGES_PER_LABEL >= 2:
-                    page2_url = build_label_page_url(base_url, 2)
-                    html2 = fetch_html(session, page2_url)
-                    scan_progress.advance(task_id)
+            with details_progress:
+                task2 = details_progress.add_task("albums", total=len(candidates))
 
-                    if html2:
-                        found2 = extract_album_candidates_from_listing(html2, page2_url, src.name, start_date, end_date)
-                        for c in found2:
-                            key = (c.album_url, c.label_name)
-                            if key not in seen_album_per_label:
-                                seen_album_per_label.add(key)
-                                candidates.append(c)
+                for cand in candidates:
+                    album = LazyAlbum(
+                        cand,
+                        fetch=partial(fetch_album, cand.album_url),
+                        profiler=profiler,
+                    )
+                    details_progress.advance(task2)
+
+                    # Filters run cheapest/most selective first; the page is parsed only as far as they need
+                    try:
+                        rejected = engine.evaluate(album)
+                        reason = rejected.reason if rejected else None
+                    except _AlbumUnavailable as e:
+                        reason = e.reason
+
+                    if reason is None:
+                        det = album.details()
+                        if det is None:  # neither title nor main artists
+                            engine.unavailable[REJECT_PARSE_FAILED] += 1
+                            reason = REJECT_PARSE_FAILED
+                        else:
+                            rec = make_output_record(cand, det, det.release_date_album or cand.release_date_listing)
+                            accepted_records.append(rec)
+                            sink.add(rec)
+
+                    if album.has("release_date") and album.get("release_date") is None:
+                        missing_album_date_rows.append(
+                            f"{cand.label_name}\t{cand.album_url}\t{cand.release_date_listing.strftime('%d.%m.%Y')}\t{album.get('title')}\t{album.get('main_artists')}"
+                        )
 
-                    polite_sleep(delay_list)
-                else:
-                    # keep progress consistent with estimate
-                    scan_progress.advance(task_id)
+                    if reason == REJECT_GENRE:
+                        # collect for final report
+                        rejected_by_genre_rows.append(
+                            (
+                                album.get("title"),
+                                album.get("main_artists"),
+                                cand.label_name,
+                                cand.album_url,
+                                (album.get("release_date") or cand.release_date_listing).strftime('%d.%m.%Y'),
+                                (album.get("genre_first") or "").strip() or "(missing)",
+                            )
+                        )
 
-        console.print(f"[bold green]✓[/bold green] Kandydaci po dacie z listingu: [bold]{len(candidates)}[/bold]\n")
+                    if dataset:
+                        dataset.add(cand, album.snapshot(), reason, album.fetch_seconds, album.parse_seconds)
 
-        # Phase 2: fetch details and filter by minimum length (AND re-check date from album page)
-        details_progress = Progress(
-            SpinnerColumn(),
-            TextColumn("[bold cyan]Pobieram strony albumów[/bold cyan]"),
-            BarColumn(),
-            TextColumn("{task.completed}/{task.total}"),
-            TimeElapsedColumn(),
-            TimeRemainingColumn(),
-            console=console,
-        )
+                    if reason not in (REJECT_OVER_BUDGET, REJECT_FETCH_FAILED):
+                        seen_album_per_label[(cand.album_url, cand.label_name)].evaluated.add(cand.album_url)
 
-        with details_progress:
-            task2 = details_progress.add_task("albums", total=len(candidates))
+                    if album.fetched and reason != REJECT_OVER_BUDGET:
+                        polite_sleep(delay_album)
 
-            for cand in candidates:
-                html = fetch_html(session, cand.album_url)
-                details_progress.advance(task2)
+        except KeyboardInterrupt:
+            console.print("\n[bold yellow]🟡 Przerwano Ctrl+C[/bold yellow] — zapisuję to, co już zebrane…")
+        finally:
+            sink.close()
+            if dataset:
+                dataset.close()
+            save_cadence(cadence_path, cadence)
+
+        # Final deduplication: (title, artists) within same label
+        before_dedup = len(accepted_records)
+        deduped: List[OutputRecord] = list(iter_deduped(accepted_records))
+        links = [r.album_url for r in deduped]
+
+        # Prepare outputs (a shard only writes its partial JSONL; "merge" builds the final files)
+        with profiler.stage(STAGE_WRITE_OUTPUTS):
+            if shard:
+                out_shard_path = script_dir / shard_output_name(*shard)
+                write_records_jsonl(out_shard_path, deduped)
+                written = [(out_shard_path.name, f"{len(deduped)} rekordów po deduplikacji")]
+            else:
+                write_links_txt(script_dir / OUT_LINKS, links)
+                write_records_jsonl(script_dir / OUT_RECORD_LOG, deduped)
+                write_xlsx(script_dir / OUT_XLSX, deduped)
+                written = [
+                    (OUT_LINKS, f"{len(links)} linków po deduplikacji"),
+                    (OUT_RECORD_LOG, f"{len(deduped)} rekordów po deduplikacji"),
+                    (OUT_XLSX, f"{len(deduped)} wierszy po deduplikacji"),
+                ]
+
+        # Optional debug: album pages where release date couldn't be parsed
+        missing_path = script_dir / OUT_MISSING_ALBUM_DATES
+        if missing_album_date_rows:
+            header = "label\talbum_url\tlisting_release_date\talbum_title\tmain_artists\n"
+            missing_path.write_text(header + "\n".join(missing_album_date_rows) + "\n", encoding="utf-8")
+
+        console.print("[bold green]💾 Zapisano pliki:[/bold green]")
+        for name, note in written:
+            console.print(f"• {name}  ([dim]{note}[/dim])")
+        console.print()
+
+        console.print("[bold]Podsumowanie:[/bold]")
+        console.print(f"• Labels w pliku: [bold]{labels_in_file}[/bold]")
+        if shard:
+            console.print(f"• Labels w tym shardzie: [bold]{len(labels)}[/bold]")
+        if scan_budget:
+            console.print(
+                f"• Zeskanowane labels (budżet {scan_budget}): [bold]{labels_scanned}[/bold]"
+                + (f" z {len(labels_to_scan)} zaplanowanych" if labels_scanned < len(labels_to_scan) else "")
+                + f", zapytania: [bold]{fetch_stats.requests}[/bold]"
+            )
+        console.print(
+            f"• Nowe wydania na listingach: oczekiwane [bold]{expected_new:.1f}[/bold], faktyczne [bold]{actual_new}[/bold]"
+            + (f" (+{first_scan_new} na labelach bez historii)" if first_scan_new else "")
+            + (f", {(actual_new + first_scan_new) / fetch_stats.pages:.2f} na zapytanie" if fetch_stats.pages else "")
+        )
+        console.print(f"• Kandydaci po dacie (listing): [bold]{len(candidates)}[/bold]")
+        console.print(f"• Przeszło wszystkie filtry: [bold]{before_dedup}[/bold]")
+        if before_dedup != len(deduped):
+            console.print(
+                f"• Usunięte duplikaty (ten sam tytuł+wykonawca w obrębie tej samej wytwórni): [bold]{before_dedup - len(deduped)}[/bold]"
+            )
+        for f in engine.filters:
+            if engine.rejected[f.name]:
+                console.print(
+                    f"• Odrzucone przez filtr [bold]{f.name}[/bold]: [bold]{engine.rejected[f.name]}[/bold] "
+                    f"[dim](sprawdzono {engine.evaluated[f.name]})[/dim]"
+                )
+                if f.reason == REJECT_GENRE and rejected_by_genre_rows:
+                    console.print(f"  [dim]Raport odrzuconych (gatunek) zapisano do: {OUT_REJECTED_BY_GENRE}[/dim]")
+        if engine.unavailable[REJECT_FETCH_FAILED]:
+            console.print(f"• Nie udało się pobrać strony albumu: [bold]{engine.unavailable[REJECT_FETCH_FAILED]}[/bold]")
+        if engine.unavailable[REJECT_OVER_BUDGET]:
+            console.print(
+                f"• Pominięte albumy (budżet zapytań wyczerpany): [bold]{engine.unavailable[REJECT_OVER_BUDGET]}[/bold]"
+            )
+        if engine.unavailable[REJECT_PARSE_FAILED]:
+            console.print(
+                f"• Strona albumu bez długości/tytułu (pominięte): [bold]{engine.unavailable[REJECT_PARSE_FAILED]}[/bold]"
+            )
+        if missing_album_date_rows:
+            console.print(
+                f"• Albumy bez rozpoznanej daty na album page (użyto daty z listingu): [bold]{len(missing_album_date_rows)}[/bold]"
+            )
+            console.print(f"  [dim]Zapisano listę URL-i do: {OUT_MISSING_ALBUM_DATES}[/dim]")
+        if dataset:
+            console.print(f"• Dataset ({dataset.format}): [bold]{dataset.rows}[/bold] albumów → [dim]{dataset.path}[/dim]")
+        console.print(
+            f"• Pobrane strony: [bold]{fetch_stats.pages}[/bold] "
+            f"({fetch_stats.bytes_total / (1024 * 1024):.1f} MiB, dekodowanie {fetch_stats.decode_seconds:.2f}s, "
+            f"szczyt pamięci na stronę ~{fetch_stats.peak_page_bytes / 1024:.0f} KiB)"
+        )
+        if fetch_stats.too_large:
+            console.print(f"• Pominięte (odpowiedź > limit rozmiaru): [bold]{fetch_stats.too_large}[/bold]")
+    finally:
+        profiler.close()
+
+    if profile_dir:
+        console.print(f"[bold]Profil etapów[/bold] ([dim]{profile_dir}[/dim]):")
+        for name, calls, wall, peak in profiler.summary():
+            console.print(
+                f"• {name}: [bold]{wall:.2f}s[/bold] ({calls}×), szczyt alokacji ~{peak / 1024:.0f} KiB"
+            )
+    console.print("[dim]Gotowe.[/dim]")
+    return RunSummary(
+        labels_scanned=labels_scanned,
+        candidates=len(candidates),
+        accepted=len(deduped),
+        fetch_stats=fetch_stats,
+    )
 
-                if not html:
-                    polite_sleep(delay_album)
-                    continue
 
-                det = parse_album_details(html)
-                if not det:
-                    polite_sleep(delay_album)
-                    continue
+class WatchState:
+    """In-memory state kept between polls in watch mode, shared with the results API.
 
-                # Re-check release date from album page, if present
-                rel_album = det.release_date_album
-                if rel_album is None:
-                    missing_album_date += 1
-                    missing_album_date_rows.append(
-                        f"{cand.label_name}\t{cand.album_url}\t{cand.release_date_listing.strftime('%d.%m.%Y')}\t{det.title}\t{det.main_artists}"
-                    )
-                    # Use listing date as fallback (strict per earlier agreement),
-                    # but it's already within range.
-                    rel_final = cand.release_date_listing
-                else:
-                    rel_final = rel_album
-                    if not (start_date <= rel_album <= end_date):
-                        mismatch_date += 1
-                        polite_sleep(delay_album)
-                        continue
+    Accepted albums mirror the append-only `sink` JSONL: `records` are the ones already
+    in it from earlier runs, so API cursor N = first N records of the file, across restarts.
+    """
 
-                # Genre gate: accept ONLY if first genre category is "Classical"
-                gf = (det.genre_first or "").strip()
-                if not gf.casefold().startswith("classical"):
-                    rejected_by_genre += 1
-                    # collect for final report
-                    rejected_by_genre_rows.append(
-                        (
-                            det.title,
-                            det.main_artists,
-                            cand.label_name,
-                            cand.album_url,
-                            rel_final.strftime('%d.%m.%Y'),
-                            gf or "(missing)",
-                        )
-                    )
-                    polite_sleep(delay_album)
-                    continue
+    def __init__(
+        self,
+        labels: List[LabelSource],
+        sink: RecordSink,
+        engine: FilterEngine,
+        records: Iterable[OutputRecord] = (),
+        max_cached_albums: int = WATCH_MAX_CACHED_ALBUMS,
+    ) -> None:
+        self.lock = threading.Lock()
+        self.labels = labels
+        self.next_due: Dict[LabelSource, float] = {src: 0.0 for src in labels}
+        self.trigger = threading.Event()
+        self.polls = 0
+        self.started = time.time()
+        self._sink = sink
+        self._accepted: List[OutputRecord] = list(records)  # cursor N = first N records
+        self._seen_keys = {record_key(r) for r in self._accepted}
+        # one engine for the daemon's lifetime: rejection rates (and so the filter order) keep learning
+        self.engine = engine
+        # album URL -> LazyAlbum.snapshot(): fields extracted so far, re-used on later polls
+        self._albums: "OrderedDict[str, Dict[str, Tuple[object, str]]]" = OrderedDict()
+        self.max_cached_albums = max_cached_albums
+
+    def cached_album(self, url: str) -> Optional[Dict[str, Tuple[object, str]]]:
+        with self.lock:
+            fields = self._albums.get(url)
+            if fields is not None:
+                self._albums.move_to_end(url)
+            return fields
+
+    def cache_album(self, url: str, fields: Dict[str, Tuple[object, str]]) -> None:
+        with self.lock:
+            self._albums[url] = fields
+            self._albums.move_to_end(url)
+            while len(self._albums) > self.max_cached_albums:
+                self._albums.popitem(last=False)
+
+    def add_accepted(self, r: OutputRecord) -> bool:
+        """Record an accepted album; False if it was already accepted (same dedup key as main()).
+
+        The record is written to the sink before the API can return it, so a cursor a
+        client has seen always points into the file.
+        """
+        key = record_key(r)
+        with self.lock:
+            if key in self._seen_keys:
+                return False
+            self._seen_keys.add(key)
+            self._sink.add(r)
+            self._accepted.append(r)
+            return True
 
-                if det.total_seconds >= min_minutes * 60:
-                    accepted_records.append(
-                        OutputRecord(
-                            album_title=det.title,
-                            main_artists=det.main_artists,
-                            label=cand.label_name,
-                            album_url=cand.album_url,
-                            release_date=rel_final,
-                        )
-                    )
+    def since(self, cursor: int, limit: int) -> Tuple[int, List[OutputRecord]]:
+        with self.lock:
+            cursor = max(0, min(cursor, len(self._accepted)))
+            batch = self._accepted[cursor : cursor + limit]
+            return cursor + len(batch), batch
+
+    def status(self) -> dict:
+        with self.lock:
+            next_due = min(self.next_due.values(), default=0.0)
+            return {
+                "labels": len(self.labels),
+                "polls": self.polls,
+                "accepted": len(self._accepted),
+                "cached_albums": len(self._albums),
+                "uptime_seconds": round(time.time() - self.started),
+                "next_poll_in_seconds": max(0, round(next_due - time.time())),
+                "filters": [
+                    {"name": f.name, "evaluated": self.engine.evaluated[f.name], "rejected": self.engine.rejected[f.name]}
+                    for f in self.engine.filters
+                ],
+                "unavailable": dict(self.engine.unavailable),
+            }
+
+
+class WatchRequestHandler(BaseHTTPRequestHandler):
+    """Local results API for watch mode.
+
+    GET  /albums?since=<cursor>&limit=<n>  accepted albums after cursor -> {"cursor": ..., "albums": [...]}
+                                           (cursor = record offset in watch_records.jsonl, kept across restarts)
+    GET  /status                           poll/cache counters, per-filter evaluated/rejected counts
+    POST /scrape                           poll all labels now
+    """
 
-                polite_sleep(delay_album)
+    server_version = "QobuzLabelScraper/watch"
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        state: WatchState = self.server.state
+        url = urlparse(self.path)
+        if url.path == "/albums":
+            params = parse_qs(url.query)
+            try:
+                cursor = int(params.get("since", ["0"])[0])
+                limit = int(params.get("limit", [str(WATCH_API_PAGE_SIZE)])[0])
+            except ValueError:
+                self._send_json(400, {"error": "since/limit must be integers"})
+                return
+            next_cursor, batch = state.since(cursor, max(1, min(limit, WATCH_API_PAGE_SIZE)))
+            self._send_json(200, {"cursor": next_cursor, "albums": [json.loads(record_to_json(r)) for r in batch]})
+        elif url.path == "/status":
+            self._send_json(200, state.status())
+        else:
+            self._send_json(404, {"error": "not found"})
 
-    except KeyboardInterrupt:
-        console.print("\n[bold yellow]🟡 Przerwano Ctrl+C[/bold yellow] — zapisuję to, co już zebrane…")
+    def do_POST(self) -> None:
+        if urlparse(self.path).path == "/scrape":
+            self.server.state.trigger.set()
+            self._send_json(202, {"triggered": True})
+        else:
+            self._send_json(404, {"error": "not found"})
 
-    # Final deduplication: (title, artists) within same label
-    before_dedup = len(accepted_records)
-    seen = set()
-    deduped: List[OutputRecord] = []
-    for r in accepted_records:
-        key = (norm_key(r.album_title), norm_key(r.main_artists), norm_key(r.label))
-        if key in seen:
-            continue
-        seen.add(key)
-        deduped.append(r)
+    def log_message(self, format: str, *args) -> None:
+        pass
 
-    # Prepare outputs
-    out_links_path = script_dir / OUT_LINKS
-    out_xlsx_path = script_dir / OUT_XLSX
 
-    links = [r.album_url for r in deduped]
+def poll_label(
+    state: WatchState,
+    session: requests.Session,
+    src: LabelSource,
+    start: date,
+    end: date,
+    delay_list: float,
+    delay_album: float,
+    stats: FetchStats,
+) -> Tuple[int, int]:
+    """One watch-mode pass over a label -> (candidates, newly accepted).
+
+    Albums go through the shared state.engine lazily: cached fields are re-used and the
+    page is fetched only if a filter needs a field the cache doesn't have.
+    """
+    candidates = scan_label_listings(session, src, start, end, delay_list, stats)
+    new = 0
+    for cand in candidates:
+        album = LazyAlbum(
+            cand,
+            fetch=partial(fetch_html, session, cand.album_url, stats),
+            known=state.cached_album(cand.album_url),
+        )
+        try:
+            rejected = state.engine.evaluate(album)
+            reason = rejected.reason if rejected else None
+        except _AlbumUnavailable as e:
+            reason = e.reason
+
+        det = album.details() if reason is None else None
+        if reason != REJECT_FETCH_FAILED and album.snapshot():
+            state.cache_album(cand.album_url, album.snapshot())
+        if album.fetched:
+            polite_sleep(delay_album)
+
+        if det is not None:
+            rec = make_output_record(cand, det, det.release_date_album or cand.release_date_listing)
+            if state.add_accepted(rec):
+                new += 1
+    return len(candidates), new
+
+
+def _raise_keyboard_interrupt(signum, frame) -> None:
+    raise KeyboardInterrupt
+
+
+def watch(
+    host: str,
+    port: int,
+    interval_minutes: float,
+    days_back: int,
+    days_ahead: int,
+    min_minutes: int,
+    delay_list: float,
+    delay_album: float,
+) -> None:
+    """Long-running mode: re-poll labels on a schedule with a warm session and caches.
+
+    The date window is rolling ([today - days_back, today + days_ahead], recomputed on
+    every poll). Accepted albums are appended to watch_links.txt / watch_records.jsonl
+    (kept across restarts, separate from the files "run" rewrites) and served by the
+    local results API (see WatchRequestHandler).
+    """
+    script_dir = Path(__file__).resolve().parent
+    labels = read_labels_file(script_dir / LABELS_FILE)
+    if not labels:
+        sys.exit(1)
 
-    write_links_txt(out_links_path, links)
-    write_xlsx(out_xlsx_path, deduped)
+    records_path = script_dir / OUT_WATCH_RECORD_LOG
+    sink = RecordSink(records_path, links_path=script_dir / OUT_WATCH_LINKS, append=True)
+    previous = list(iter_records_jsonl([records_path])) if records_path.exists() else []
+    engine = FilterEngine(default_album_filters(rolling_date_filter(days_back, days_ahead), min_minutes))
+    state = WatchState(labels, sink, engine, previous)
+    session = make_session()
+    stats = FetchStats()
+    interval = max(0.0, interval_minutes * 60)
+
+    server = ThreadingHTTPServer((host, port), WatchRequestHandler)
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, name="watch-api", daemon=True).start()
+    # service managers stop daemons with SIGTERM: shut down like on Ctrl+C
+    signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+
+    console.print("[bold magenta]Qobuz multi-label scraper — tryb watch[/bold magenta]")
+    console.print(f"• Labels: [bold]{len(labels)}[/bold], odświeżanie co [bold]{interval_minutes:g}[/bold] min")
+    console.print(f"• Okno dat: dziś −{days_back} / +{days_ahead} dni, minimalna długość: {min_minutes} min")
+    console.print(f"• Wyniki: {OUT_WATCH_RECORD_LOG} ({len(previous)} z poprzednich uruchomień), {OUT_WATCH_LINKS}")
+    console.print(f"• API: [bold]http://{host}:{server.server_port}/albums?since=0[/bold]  (Ctrl+C kończy)\n")
 
-    # Optional debug: album pages where release date couldn't be parsed
-    missing_path = script_dir / OUT_MISSING_ALBUM_DATES
-    if missing_album_date_rows:
-        header = "label\talbum_url\tlisting_release_date\talbum_title\tmain_artists\n"
-        missing_path.write_text(header + "\n".join(missing_album_date_rows) + "\n", encoding="utf-8")
+    try:
+        while True:
+            if state.trigger.is_set():
+                state.trigger.clear()
+                with state.lock:
+                    for src in labels:
+                        state.next_due[src] = 0.0
+
+            today = date.today()
+            start, end = today - timedelta(days=days_back), today + timedelta(days=days_ahead)
+            due = [src for src in labels if state.next_due[src] <= time.time()]
+            for src in due:
+                n_cand, n_new = poll_label(
+                    state, session, src, start, end, delay_list, delay_album, stats
+                )
+                with state.lock:
+                    state.next_due[src] = time.time() + interval
+                if n_new:
+                    console.print(
+                        f"[dim]{datetime.now():%H:%M:%S}[/dim] {src.name}: kandydaci {n_cand}, "
+                        f"[bold green]nowe {n_new}[/bold green]"
+                    )
+            if due:
+                state.polls += 1
 
-    console.print("[bold green]💾 Zapisano pliki:[/bold green]")
-    console.print(f"• {OUT_LINKS}  ([dim]{len(links)} linków po deduplikacji[/dim])")
-    console.print(f"• {OUT_XLSX}  ([dim]{len(deduped)} wierszy po deduplikacji[/dim])\n")
+            with state.lock:
+                wait = min(state.next_due.values()) - time.time()
+            state.trigger.wait(timeout=max(0.0, wait))
 
-    console.print("[bold]Podsumowanie:[/bold]")
-    console.print(f"• Labels w pliku: [bold]{len(labels)}[/bold]")
-    console.print(f"• Kandydaci po dacie (listing): [bold]{len(candidates)}[/bold]")
-    console.print(f"• Przeszło filtr długości ({min_minutes} min): [bold]{before_dedup}[/bold]")
-    if before_dedup != len(deduped):
-        console.print(
-            f"• Usunięte duplikaty (ten sam tytuł+wykonawca w obrębie tej samej wytwórni): [bold]{before_dedup - len(deduped)}[/bold]"
-        )
-    if mismatch_date:
-        console.print(
-            f"• Odrzucone po weryfikacji daty na album page (poza zakresem): [bold]{mismatch_date}[/bold]"
-        )
-    if rejected_by_genre:
-        console.print(
-            f"• Odrzucone przez filtr gatunku (pierwszy != Classical): [bold]{rejected_by_genre}[/bold]"
+    except KeyboardInterrupt:
+        console.print("\n[bold yellow]🟡 Przerwano Ctrl+C[/bold yellow] — zatrzymuję tryb watch…")
+    finally:
+        sink.close()
+        server.shutdown()
+        server.server_close()
+    console.print(f"• Zaakceptowane albumy: [bold]{state.status()['accepted']}[/bold], pobrane strony: {stats.pages}")
+
+
+def cli(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Qobuz multi-label scraper")
+    sub = parser.add_subparsers(dest="command")
+    p_run = sub.add_parser("run", help="interactive scrape (default)")
+    p_run.add_argument(
+        "--shard",
+        type=parse_shard,
+        metavar="i/N",
+        help="scrape only labels of shard i of N (stable hash of label URL); writes shard JSONL for 'merge'",
+    )
+    p_run.add_argument(
+        "--dataset",
+        type=Path,
+        metavar="DIR",
+        help="also write one row per processed album to DIR/run_date=.../*.parquet (CSV without pyarrow)",
+    )
+    p_run.add_argument(
+        "--filter",
+        dest="filters",
+        action="append",
+        type=parse_filter_spec,
+        default=[],
+        metavar="SPEC",
+        help="extra album filter, repeatable: 'genre in Classical,Opera', 'length >= 20', 'label not in X,Y', "
+        "'date <= 31.12.2026' (a genre/length filter replaces the default one)",
+    )
+    p_run.add_argument(
+        "--budget",
+        type=parse_budget,
+        metavar="N",
+        help=f"request budget per run: scan only the labels most likely to have new releases ({CADENCE_FILE}); "
+        "no label scan or album fetch starts after N requests",
+    )
+    p_run.add_argument(
+        "--profile",
+        type=Path,
+        nargs="?",
+        const=Path("profile"),
+        metavar="DIR",
+        help="write per-stage .pstats, allocation tops and stacks.collapsed to DIR (default: ./profile)",
+    )
+    p_watch = sub.add_parser("watch", help="keep running: re-poll labels on a schedule, serve results over local HTTP")
+    p_watch.add_argument("--interval", type=float, default=60.0, help="minutes between polls of a label (default 60)")
+    p_watch.add_argument("--days-back", type=int, default=14, help="date window start: today minus N days")
+    p_watch.add_argument("--days-ahead", type=int, default=90, help="date window end: today plus N days")
+    p_watch.add_argument("--min-minutes", type=int, default=15, help="minimum album length in minutes")
+    p_watch.add_argument("--delay-list", type=float, default=0.35, help="delay between listing pages (s)")
+    p_watch.add_argument("--delay-album", type=float, default=0.55, help="delay between album pages (s)")
+    p_watch.add_argument("--host", default="127.0.0.1", help="results API host (default 127.0.0.1)")
+    p_watch.add_argument("--port", type=int, default=8765, help="results API port (default 8765)")
+    p_merge = sub.add_parser("merge", help="merge shard JSONL files into list_links.txt + XLSX")
+    p_merge.add_argument("shards", nargs="+", type=Path, help="shard_*.jsonl files")
+    p_merge.add_argument(
+        "--out-dir", type=Path, default=Path(__file__).resolve().parent, help="output folder (default: script folder)"
+    )
+    p_cmp = sub.add_parser("compare-structured", help="compare structured-data vs text fields on saved album pages")
+    p_cmp.add_argument(
+        "pages", nargs="*", type=Path, help="saved album page HTML files (default: bundled fixtures/album_pages)"
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "compare-structured":
+        if compare_structured_fields(args.pages):
+            sys.exit(1)
+    elif args.command == "merge":
+        merge_shards(args.shards, args.out_dir)
+    elif args.command == "watch":
+        watch(
+            host=args.host,
+            port=args.port,
+            interval_minutes=args.interval,
+            days_back=args.days_back,
+            days_ahead=args.days_ahead,
+            min_minutes=max(0, args.min_minutes),
+            delay_list=args.delay_list,
+            delay_album=args.delay_album,
         )
-        if rejected_by_genre_rows:
-            console.print(f"  [dim]Raport odrzuconych (gatunek) zapisano do: {OUT_REJECTED_BY_GENRE}[/dim]")
-    if missing_album_date:
-        console.print(
-            f"• Albumy bez rozpoznanej daty na album page (użyto daty z listingu): [bold]{missing_album_date}[/bold]"
+    else:
+        main(
+            shard=getattr(args, "shard", None),
+            dataset_dir=getattr(args, "dataset", None),
+            profile_dir=getattr(args, "profile", None),
+            scan_budget=getattr(args, "budget", None),
+            extra_filters=getattr(args, "filters", []),
         )
-        console.print(f"  [dim]Zapisano listę URL-i do: {OUT_MISSING_ALBUM_DATES}[/dim]")
-    console.print("[dim]Gotowe.[/dim]")
 
 
 if __name__ == "__main__":
-    main()
+    cli()